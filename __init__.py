@@ -49,6 +49,7 @@ def register():
 
     registry.blender_register_classes()
     registry.blender_register_timers()
+    registry.blender_register_handlers()
     registry.blender_register_icons()
 
     bpy.types.WorkSpace.blendertoprusaslicer = bpy.props.PointerProperty(type=bpy_property_groups.SlicerWorkspacePropertyGroup, name="blendertoprusaslicer", options={'SKIP_SAVE'}) #type: ignore
@@ -62,10 +63,11 @@ def register():
 
 def unregister():   
     from .ui.panels.gcode_preview_panel import drawer
-    drawer.stop()
+    drawer.shutdown()
 
     registry.blender_unregister_classes()
     registry.blender_unregister_timers()
+    registry.blender_unregister_handlers()
     registry.blender_unregister_icons() 
 
     del bpy.types.WorkSpace.blendertoprusaslicer #type: ignore
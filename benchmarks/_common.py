@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+# benchmarks run as plain scripts from this folder; import infra/ from the add-on folder next to it
+ADDON_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ADDON_FOLDER not in sys.path:
+    sys.path.insert(0, ADDON_FOLDER)
+
+def timed(func, *args, repeat: int = 1, **kwargs):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def traced_peak_mb(func, *args, **kwargs) -> float:
+    # peak python + numpy allocations during a single call
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+def write_synthetic_gcode(path: str, layers: int = 200, moves_per_layer: int = 2000) -> str:
+    import random
+    rnd = random.Random(0)
+    types = ['Perimeter', 'External perimeter', 'Internal infill', 'Solid infill', 'Top solid infill', 'Gap fill', 'Skirt/Brim']
+
+    with open(path, 'w') as f:
+        f.write('; generated by benchmarks/_common.py\n')
+        f.write('M104 S215 ; set temperature\nM109 S215\nM107\nG28 W ; home\nG90\nM83\n')
+        z = 0.0
+        for layer in range(layers):
+            height = 0.2
+            z = round(z + height, 3)
+            f.write(f';LAYER_CHANGE\n;Z:{z}\n;HEIGHT:{height}\n')
+            f.write(f'G1 E-.8 F2100\nG1 Z{z} F720\n')
+            if layer == 2: f.write('M106 S255\n')
+            x, y = 100.0, 100.0
+            for m in range(moves_per_layer):
+                if m % 250 == 0:
+                    f.write(f';TYPE:{rnd.choice(types)}\n;WIDTH:{rnd.uniform(0.4, 0.5):.4f}\n')
+                    f.write(f'G1 X{x:.3f} Y{y:.3f} F9000\nG1 E.8 F2100\n')
+                x = min(max(x + rnd.uniform(-5, 5), 0.0), 250.0)
+                y = min(max(y + rnd.uniform(-5, 5), 0.0), 210.0)
+                f.write(f'G1 X{x:.3f} Y{y:.3f} E{rnd.uniform(0.01, 0.2):.5f}\n')
+        f.write('M107\nM104 S0 ; turn off temperature\n')
+        f.write('; filament used [mm] = 1234.56\n; filament used [g] = 3.70\n')
+        f.write('; estimated printing time (normal mode) = 1h 2m 3s\n')
+    return path
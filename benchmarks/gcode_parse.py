@@ -0,0 +1,42 @@
+# Compares infra.gcode.parse_gcode against the regex reference parser.
+#   python benchmarks/gcode_parse.py [file.gcode] [--layers N] [--chunk-size BYTES]
+import argparse
+import os
+import tempfile
+
+from _common import timed, traced_peak_mb, write_synthetic_gcode
+
+import numpy as np
+from infra.gcode import CHUNK_SIZE, parse_gcode, parse_gcode_regex
+
+FIELDS = ('pos', 'width', 'height', 'fan_speed', 'temperature', 'extrusion', 'feature_type', 'pt_id_of_seg')
+
+def compare(a, b) -> list[str]:
+    if a.seg_count != b.seg_count:
+        return [f'seg_count {a.seg_count} != {b.seg_count}']
+    n = a.seg_count
+    return [f for f in FIELDS if not np.array_equal(getattr(a, f)[:n], getattr(b, f)[:n])]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('path', nargs='?')
+    ap.add_argument('--layers', type=int, default=200)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='0 parses the file in a single block')
+    args = ap.parse_args()
+
+    path = args.path or write_synthetic_gcode(os.path.join(tempfile.gettempdir(), 'us_bench.gcode'), layers=args.layers)
+    print(f'{path}: {os.path.getsize(path) / 1e6:.1f} MB')
+
+    t_new, new = timed(parse_gcode, path, args.chunk_size, repeat=args.repeat)
+    print(f'parse_gcode        {t_new:8.3f} s  {new.seg_count} segments  peak {traced_peak_mb(parse_gcode, path, args.chunk_size):.0f} MB')
+
+    t_old, old = timed(parse_gcode_regex, path, repeat=args.repeat)
+    print(f'parse_gcode_regex  {t_old:8.3f} s  {old.seg_count} segments  peak {traced_peak_mb(parse_gcode_regex, path):.0f} MB')
+
+    print(f'speedup x{t_old / t_new:.1f}')
+    mismatches = compare(new, old)
+    print('results match' if not mismatches else f'MISMATCH: {", ".join(mismatches)}')
+
+if __name__ == '__main__':
+    main()
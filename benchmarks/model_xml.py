@@ -0,0 +1,88 @@
+# Compares infra._3mf.write_rows against the np.vectorize templates it replaced when writing 3dmodel.model vertices and triangles,
+# and write_model_xml on a plate of --objects collections encoded serially and on --workers threads.
+#   python benchmarks/model_xml.py [--triangles 1000000 5000000 10000000] [--no-reference] [--objects 24] [--workers 8]
+import argparse
+import hashlib
+import os
+import tempfile
+from types import SimpleNamespace
+
+from _common import timed
+
+import numpy as np
+from infra._3mf import TRIANGLE_XML, VERTEX_XML, write_model_xml, write_rows
+
+def synthetic_mesh(triangles: int) -> tuple[np.ndarray, np.ndarray]:
+    # about two triangles per vertex, like a closed mesh
+    rng = np.random.default_rng(0)
+    verts = (rng.random((triangles // 2 + 3, 3)) * 250.0).astype(np.float32)
+    faces = rng.integers(0, len(verts), (triangles, 3), dtype=np.int64)
+    return verts, faces
+
+def write_bulk(path: str, verts: np.ndarray, faces: np.ndarray) -> None:
+    with open(path, 'w', encoding='UTF-8') as file:
+        write_rows(file, VERTEX_XML, verts)
+        write_rows(file, TRIANGLE_XML, faces)
+
+def write_reference(path: str, verts: np.ndarray, faces: np.ndarray) -> None:
+    verts_template = np.vectorize(lambda x, y, z: '<vertex x="%.6f" y="%.6f" z="%.6f" />\n' % (x, y, z))
+    idx_template = np.vectorize(lambda a, b, c: '<triangle v1="%d" v2="%d" v3="%d" />\n' % (a, b, c))
+    with open(path, 'w', encoding='UTF-8') as file:
+        file.writelines(verts_template(verts[:, 0], verts[:, 1], verts[:, 2]))
+        file.writelines(idx_template(faces[:, 0], faces[:, 1], faces[:, 2]))
+
+def synthetic_plate(triangles: int, objects: int) -> SimpleNamespace:
+    # stands in for a SlicingGroup: only collections with objects and indexed_mesh are read
+    collections = {}
+    for i in range(objects):
+        verts, faces = synthetic_mesh(max(triangles // objects, 1))
+        collections[f'object_{i}'] = SimpleNamespace(objects=[None], indexed_mesh=(verts, faces))
+    return SimpleNamespace(collections=collections)
+
+def write_plate(path: str, plate: SimpleNamespace, workers: int) -> None:
+    with open(path, 'w', encoding='UTF-8') as file:
+        write_model_xml(plate, file, workers)
+
+def digest(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--triangles', type=int, nargs='+', default=[1_000_000, 5_000_000, 10_000_000])
+    ap.add_argument('--repeat', type=int, default=1)
+    ap.add_argument('--no-reference', action='store_true', help='skip the slow np.vectorize writer')
+    ap.add_argument('--objects', type=int, default=24, help='collections on the plate, 0 skips the plate comparison')
+    ap.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, 16))
+    args = ap.parse_args()
+
+    tmp = tempfile.gettempdir()
+    bulk_path = os.path.join(tmp, 'us_bench_bulk.model')
+    ref_path = os.path.join(tmp, 'us_bench_ref.model')
+
+    for n in args.triangles:
+        verts, faces = synthetic_mesh(n)
+        t_new, _ = timed(write_bulk, bulk_path, verts, faces, repeat=args.repeat)
+        line = f'{n:>10} triangles  write_rows {t_new:8.3f} s  {os.path.getsize(bulk_path) / 1e6:.0f} MB'
+        if not args.no_reference:
+            t_old, _ = timed(write_reference, ref_path, verts, faces, repeat=args.repeat)
+            same = digest(bulk_path) == digest(ref_path)
+            line += f'  np.vectorize {t_old:8.3f} s  speedup x{t_old / t_new:.1f}  {"identical" if same else "MISMATCH"}'
+        print(line)
+
+        if args.objects:
+            plate = synthetic_plate(n, args.objects)
+            t_serial, _ = timed(write_plate, ref_path, plate, 1, repeat=args.repeat)
+            t_threads, _ = timed(write_plate, bulk_path, plate, args.workers, repeat=args.repeat)
+            same = digest(bulk_path) == digest(ref_path)
+            print(f'{"":>10} {args.objects} objects  serial {t_serial:8.3f} s  {args.workers} workers {t_threads:8.3f} s  speedup x{t_serial / t_threads:.1f}  {"identical" if same else "MISMATCH"}')
+
+    for path in (bulk_path, ref_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+if __name__ == '__main__':
+    main()
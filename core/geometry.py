@@ -5,4 +5,24 @@ def crc32_array(a: np.ndarray) -> int:
     if not a.size: return 0
     ac = np.ascontiguousarray(a)
     mv = memoryview(ac.data).cast("B")
-    return zlib.adler32(mv)
\ No newline at end of file
+    return zlib.adler32(mv)
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+def merge_exact_duplicates(co: np.ndarray, faces: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # merges bitwise identical float32 vertices into their first occurrence and renumbers faces, order kept (-0.0 and 0.0 stay apart).
+    # Sorts one packed uint64 per vertex (x, y bits xor the mixed z bits) with np.unique instead of whole rows;
+    # distinct vertices can share a key, so when any grouped vertex differs from its representative the exact row unique is redone
+    bits = np.ascontiguousarray(co, dtype=np.float32).view(np.uint32).astype(np.uint64)
+    key = (bits[:, 0] << np.uint64(32) | bits[:, 1]) ^ (bits[:, 2] * _MIX)
+    _, first, inv = np.unique(key, return_index=True, return_inverse=True)
+    rep = first[inv.reshape(-1)]
+    if not np.array_equal(bits[rep], bits):
+        _, first, inv = np.unique(bits, axis=0, return_index=True, return_inverse=True)
+        rep = first[inv.reshape(-1)]
+    if len(first) == len(co):
+        return co, faces
+
+    keep = rep == np.arange(len(co))
+    remap = np.cumsum(keep, dtype=np.int32) - 1
+    return co[keep], remap[rep[faces]]
@@ -1,16 +1,128 @@
 from __future__ import annotations
 
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import IO, TYPE_CHECKING, Callable, Iterable, Iterator, TextIO
 
 import numpy as np
-import os, shutil, tempfile
+import io, os, re, zipfile
 import xml.etree.ElementTree as ET
 from datetime import date
 
-from ..infra.blender_mesh_capture import SlicingGroup, SlicingCollection
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+    from ..infra.blender_mesh_capture import SlicingGroup, SlicingCollection
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
+VERTEX_XML = '<vertex x="%.6f" y="%.6f" z="%.6f" />\n'
+TRIANGLE_XML = '<triangle v1="%d" v2="%d" v3="%d" />\n'
+WRITE_ROWS = 1 << 16 # rows formatted per write
+
+_SPEC = re.compile(r"%(?:\.(\d+)f|d)")
+
+def _digits(col: NDArray, frac: int) -> tuple[NDArray[np.uint8], NDArray[np.intp], NDArray[np.bool_]]:
+    # (W, N) zero-padded ascii digits of '%.{frac}f' or '%d' without point and sign, digit counts, signs
+    if frac:
+        # exact for float32: x * 10**frac needs at most 24 + 20 bits, so rint rounds like printf
+        neg = np.signbit(col)
+        m = np.abs(np.rint(col.astype(np.float64) * 10.0 ** frac)).astype(np.int64)
+    else:
+        neg = col < 0
+        m = np.abs(col.astype(np.int64))
+
+    top = int(m.max()) if len(m) else 0
+    m = m.astype(np.uint32 if top < 2**32 else np.uint64)
+    width = max(len(str(top)), frac + 1)
+    n = np.full(len(m), frac + 1, dtype=np.intp)
+    for k in range(frac + 1, width):
+        n += m >= 10 ** k
+
+    digits = np.empty((width, len(m)), dtype=np.uint8)
+    for k in range(width - 1, -1, -1):
+        q = m // 10
+        digits[k] = m - q * 10
+        m = q
+    digits += ord("0")
+    return digits, n, neg
+
+def format_rows(template: str, rows: NDArray) -> bytes:
+    # template % row for every row, concatenated: numbers are rendered digit by digit in numpy into a
+    # fixed-width row layout, then the unused leading positions are dropped with one mask
+    literals = [lit.encode("ascii") for lit in _SPEC.split(template)[::2]]
+    fracs = [int(f) if f else 0 for f in _SPEC.findall(template)]
+    fields = [_digits(rows[:, i], frac) for i, frac in enumerate(fracs)]
+    row_width = sum(len(lit) for lit in literals) + sum(1 + len(d) + (frac > 0) for (d, _, _), frac in zip(fields, fracs))
+
+    chars = np.empty((len(rows), row_width), dtype=np.uint8)
+    keep = np.ones((len(rows), row_width), dtype=bool)
+    at = 0
+    for i, lit in enumerate(literals):
+        chars[:, at:at + len(lit)] = np.frombuffer(lit, dtype=np.uint8)
+        at += len(lit)
+        if i == len(fields):
+            break
+        digits, n, neg = fields[i]
+        frac, width = fracs[i], len(digits)
+        chars[:, at] = ord("-")
+        keep[:, at] = neg
+        at += 1
+        int_width = width - frac
+        chars[:, at:at + int_width] = digits[:int_width].T
+        keep[:, at:at + int_width] = np.arange(width - frac) >= (width - n)[:, None]
+        at += int_width
+        if frac:
+            chars[:, at] = ord(".")
+            chars[:, at + 1:at + 1 + frac] = digits[int_width:].T
+            at += 1 + frac
+    return chars[keep].tobytes()
+
+def _bulk_formattable(template: str, rows: NDArray) -> bool:
+    specs = _SPEC.findall(template)
+    if len(specs) != rows.shape[1] or _SPEC.sub("", template).count("%"):
+        return False
+    if any(specs):
+        return rows.dtype == np.float32 and bool(np.isfinite(rows).all()) and float(np.abs(rows).max(initial=0)) < 1e12
+    return rows.dtype.kind in "iu"
+
+def _format_chunk(template: str, chunk: NDArray, bulk: bool) -> str:
+    if bulk:
+        return format_rows(template, chunk).decode("ascii")
+    return (template * len(chunk)) % tuple(chunk.ravel().tolist())
+
+def row_jobs(template: str, rows: NDArray, chunk_rows: int = WRITE_ROWS) -> Iterator[Callable[[], str]]:
+    # independent jobs rendering template % row for consecutive chunks of rows
+    bulk = _bulk_formattable(template, rows)
+    for start in range(0, len(rows), chunk_rows):
+        yield partial(_format_chunk, template, rows[start:start + chunk_rows], bulk)
+
+def write_rows(file: TextIO, template: str, rows: NDArray, chunk_rows: int = WRITE_ROWS) -> None:
+    # same text as writing template % row for each row
+    for job in row_jobs(template, rows, chunk_rows):
+        file.write(job())
+
+def write_ordered(file: TextIO, parts: Iterable[str | Callable[[], str]], workers: int | None = None) -> None:
+    # writes literal parts as they are and job parts once rendered, in order.
+    # numpy releases the GIL while formatting, so jobs run in threads with a bounded number in flight
+    workers = workers or min(os.cpu_count() or 1, 16)
+    if workers == 1:
+        for part in parts:
+            file.write(part if isinstance(part, str) else part())
+        return
+
+    pending: deque[str | Future[str]] = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for part in parts:
+            pending.append(part if isinstance(part, str) else executor.submit(part))
+            while len(pending) > 2 * workers:
+                done = pending.popleft()
+                file.write(done if isinstance(done, str) else done.result())
+        while pending:
+            done = pending.popleft()
+            file.write(done if isinstance(done, str) else done.result())
+
 def indent(elem, level=0):
     i = "\n" + level * " "
     if len(elem):
@@ -24,7 +136,7 @@ def indent(elem, level=0):
         if level and (not elem.tail or not elem.tail.strip()):
             elem.tail = i
 
-def write_metadata_xml(group: SlicingGroup, filepath):
+def write_metadata_xml(group: SlicingGroup, file: IO[bytes]):
     # Custom sorting order for object types
     object_type_order = {
         'ModelPart': 0,
@@ -36,7 +148,7 @@ def write_metadata_xml(group: SlicingGroup, filepath):
 
     xml_content = ET.Element("config")
 
-    valid_collections = {k: c for k, c in group.collections.items() if c.meshes}
+    valid_collections = {k: c for k, c in group.collections.items() if c.objects}
 
     for j, (k, collection) in enumerate(valid_collections.items()):
 
@@ -66,85 +178,75 @@ def write_metadata_xml(group: SlicingGroup, filepath):
 
     indent(xml_content)
     xml_tree = ET.ElementTree(xml_content)
-    xml_tree.write(filepath, encoding="UTF-8", xml_declaration=True)
-
-def write_wipe_tower_xml(group: SlicingGroup, filename):
-    with open(filename, 'w', encoding="UTF-8") as file:
-        file.write(f'<?xml version="1.0" encoding="utf-8"?>\n')
-        file.write(f'<wipe_tower_information bed_idx="0" position_x="{group.wipe_tower_xy[0]}" position_y="{group.wipe_tower_xy[1]}" rotation_deg="{group.wipe_tower_rotation_deg}"/>\n')
-
-def write_model_xml(group: SlicingGroup, filename: str):
-    now = date.today().isoformat()
-    
-    # Open file for writing
-    with open(filename, 'w', encoding="UTF-8") as file:
-        # Write the XML declaration and opening model tag
-        file.write(f'<?xml version="1.0" encoding="UTF-8"?>\n')
-        file.write(f'<model xmlns="" unit="millimeter" xml:lang="en-US" xmlns:slic3rpe="">\n')
-        
-        # Write metadata entries using list comprehension
-        metadata_entries: list[tuple[str, str]] = [
-            ("slic3rpe:Version3mf", "1"),
-            ("Title", "box"),
-            ("Designer", ""),
-            ("Description", "box"),
-            ("Copyright", ""),
-            ("LicenseTerms", ""),
-            ("Rating", ""),
-            ("CreationDate", now),
-            ("ModificationDate", now),
-            ("Application", "PrusaSlicer-2.9.0")
-        ]
-        file.writelines([f'  <metadata name="{name}">{value}</metadata>\n' for name, value in metadata_entries])
-
-        # Write resources element and object using list comprehension
-        file.write(f'  <resources>\n')
-
-        verts_template = np.vectorize(lambda x, y, z: '<vertex x="%.6f" y="%.6f" z="%.6f" />\n' % (x, y, z))
-        idx_template = np.vectorize(lambda a, b, c: '<triangle v1="%d" v2="%d" v3="%d" />\n' % (a, b, c))
-
-        valid_collections: dict[str, SlicingCollection] = {k: c for k, c in group.collections.items() if c.meshes}
+    xml_tree.write(file, encoding="UTF-8", xml_declaration=True)
 
-        for i, (k, collection) in enumerate[tuple[str, SlicingCollection]](valid_collections.items()):
-            if not collection.meshes: continue
+def write_wipe_tower_xml(group: SlicingGroup, file: TextIO):
+    file.write(f'<?xml version="1.0" encoding="utf-8"?>\n')
+    file.write(f'<wipe_tower_information bed_idx="0" position_x="{group.wipe_tower_xy[0]}" position_y="{group.wipe_tower_xy[1]}" rotation_deg="{group.wipe_tower_rotation_deg}"/>\n')
 
-            uv, t_idx = collection.unique_verts
+def mesh_parts(collections: Iterable[SlicingCollection]) -> Iterator[str | Callable[[], str]]:
+    # <object> elements of the collections, with vertex and triangle rows as row_jobs
+    for i, collection in enumerate(collections):
+        uv, t_idx = collection.indexed_mesh
 
-            if uv.size and t_idx.size: 
-                file.write(f'    <object id="{str(i+1)}" type="model">\n')
+        if uv.size and t_idx.size:
+            yield f'    <object id="{str(i+1)}" type="model">\n'
+            yield f'      <mesh>\n'
 
-                file.write(f'      <mesh>\n')
+            yield f'        <vertices>\n'
+            yield from row_jobs(VERTEX_XML, uv)
+            yield f'        </vertices>\n'
 
-                file.write(f'        <vertices>\n')
-                file.writelines(verts_template(uv[:,0], uv[:,1], uv[:,2]))
-                file.write(f'        </vertices>\n')
+            yield f'        <triangles>\n'
+            yield from row_jobs(TRIANGLE_XML, t_idx)
+            yield f'        </triangles>\n'
 
-                file.write(f'        <triangles>\n')
-                file.writelines(idx_template(t_idx[:,0], t_idx[:,1], t_idx[:,2]))
-                file.write(f'        </triangles>\n')
+            yield f'      </mesh>\n'
+            yield f'    </object>\n'
 
-                file.write(f'      </mesh>\n')
-                file.write(f'    </object>\n')
-
-        file.write(f'  </resources>\n')
-
-        # Write build element
-        file.write(f'  <build>\n')
-        for i, k in enumerate(valid_collections):
-            if not valid_collections[k].unique_verts[0].size: continue
-            file.writelines([f'    <item objectid="{str(i+1)}" transform="1 0 0 0 1 0 0 0 1 0 0 0" printable="1" />\n' ])
-        file.write(f'  </build>\n')
-
-        # Close the model tag
-        file.write(f'</model>\n')
-
-
-def to_3mf(folder_path, output_base_path):
-    zip_file_path = shutil.make_archive(os.path.splitext(output_base_path)[0], 'zip', folder_path)
-    new_file_path = os.path.splitext(zip_file_path)[0] + '.3mf'
-    os.replace(zip_file_path, new_file_path)
+def write_model_xml(group: SlicingGroup, file: TextIO, workers: int | None = None):
+    now = date.today().isoformat()
 
-def write_z_gcodes(z_gcodes, filename: str):
+    # Write the XML declaration and opening model tag
+    file.write(f'<?xml version="1.0" encoding="UTF-8"?>\n')
+    file.write(f'<model xmlns="" unit="millimeter" xml:lang="en-US" xmlns:slic3rpe="">\n')
+    
+    # Write metadata entries using list comprehension
+    metadata_entries: list[tuple[str, str]] = [
+        ("slic3rpe:Version3mf", "1"),
+        ("Title", "box"),
+        ("Designer", ""),
+        ("Description", "box"),
+        ("Copyright", ""),
+        ("LicenseTerms", ""),
+        ("Rating", ""),
+        ("CreationDate", now),
+        ("ModificationDate", now),
+        ("Application", "PrusaSlicer-2.9.0")
+    ]
+    file.writelines([f'  <metadata name="{name}">{value}</metadata>\n' for name, value in metadata_entries])
+
+    # Write resources element and object using list comprehension
+    file.write(f'  <resources>\n')
+
+    valid_collections: dict[str, SlicingCollection] = {k: c for k, c in group.collections.items() if c.objects}
+
+    write_ordered(file, mesh_parts(valid_collections.values()), workers)
+
+    file.write(f'  </resources>\n')
+
+    # Write build element
+    file.write(f'  <build>\n')
+    for i, k in enumerate(valid_collections):
+        if not valid_collections[k].indexed_mesh[0].size: continue
+        file.writelines([f'    <item objectid="{str(i+1)}" transform="1 0 0 0 1 0 0 0 1 0 0 0" printable="1" />\n' ])
+    file.write(f'  </build>\n')
+
+    # Close the model tag
+    file.write(f'</model>\n')
+
+
+def write_z_gcodes(z_gcodes, file: IO[bytes]):
     root = ET.Element("custom_gcodes_per_print_z", bed_idx="0")
 
     for c in z_gcodes:
@@ -159,24 +261,37 @@ def write_z_gcodes(z_gcodes, filename: str):
 
     ET.SubElement(root, "mode", {"value": "SingleExtruder"})
 
-    ET.ElementTree(root).write(filename, encoding="utf-8", xml_declaration=True)
-
-def prepare_3mf(filepath: Path, geoms: SlicingGroup, conf, z_gcodes) -> None:
+    ET.ElementTree(root).write(file, encoding="utf-8", xml_declaration=True)
 
+def prepare_3mf(filepath: Path, geoms: SlicingGroup, conf, z_gcodes, compression: int = zipfile.ZIP_DEFLATED, compresslevel: int | None = None) -> None:
+    # every part is streamed into the archive, nothing is staged on disk
     source_folder = os.path.join(script_dir, 'prusaslicer_3mf')
-    temp_dir = tempfile.mkdtemp()
-    shutil.copytree(source_folder, temp_dir, dirs_exist_ok=True)
-    
-    os.makedirs(os.path.join(temp_dir, '3D'), exist_ok=True)
-    os.makedirs(os.path.join(temp_dir, 'Metadata'), exist_ok=True)
-
-    write_model_xml(geoms, os.path.join(temp_dir, '3D', '3dmodel.model'))
-
-    write_metadata_xml(geoms, os.path.join(temp_dir, 'Metadata', 'Slic3r_PE_model.config'))
-    write_wipe_tower_xml(geoms, os.path.join(temp_dir, 'Metadata', 'Prusa_Slicer_wipe_tower_information.xml'))
-    write_z_gcodes(z_gcodes, os.path.join(temp_dir, 'Metadata', 'Prusa_Slicer_custom_gcode_per_print_z.xml'))
-    conf.write_ini_3mf(os.path.join(temp_dir, 'Metadata', 'Slic3r_PE.config'))
-
-    to_3mf(temp_dir, filepath)
 
-    return None
\ No newline at end of file
+    def text(zf: zipfile.ZipFile, name: str) -> TextIO:
+        return io.TextIOWrapper(zf.open(name, 'w', force_zip64=True), encoding="UTF-8")
+
+    try:
+        with zipfile.ZipFile(filepath, 'w', compression=compression, compresslevel=compresslevel) as zf:
+            for root, _, files in os.walk(source_folder):
+                for name in files:
+                    path = os.path.join(root, name)
+                    zf.write(path, os.path.relpath(path, source_folder))
+
+            with text(zf, '3D/3dmodel.model') as file:
+                write_model_xml(geoms, file)
+
+            with zf.open('Metadata/Slic3r_PE_model.config', 'w') as file:
+                write_metadata_xml(geoms, file)
+            with text(zf, 'Metadata/Prusa_Slicer_wipe_tower_information.xml') as file:
+                write_wipe_tower_xml(geoms, file)
+            with zf.open('Metadata/Prusa_Slicer_custom_gcode_per_print_z.xml', 'w') as file:
+                write_z_gcodes(z_gcodes, file)
+            with text(zf, 'Metadata/Slic3r_PE.config') as file:
+                conf.write_ini_3mf(file)
+    except BaseException:
+        # no half written archive for PrusaSlicer or the slice cache to pick up
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        raise
+
+    return None
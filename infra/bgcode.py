@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+# Reader for PrusaSlicer binary G-code (.bgcode, libbgcode format version 1).
+# Blocks are read one at a time: metadata is kept as dicts, thumbnails as raw
+# image bytes, and G-code blocks are decoded into ASCII G-code that feeds the
+# regular tokenizer, so no decoded copy of the whole file is ever held.
+
+import struct
+import zlib
+from enum import IntEnum
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+import numpy as np
+from numpy.typing import NDArray
+
+MAGIC = b'GCDE'
+
+_FILE_HEADER = struct.Struct('<4sIH')   # magic, version, checksum type
+_BLOCK_HEADER = struct.Struct('<HHI')   # type, compression, uncompressed size
+_COMPRESSED_SIZE = struct.Struct('<I')
+_THUMBNAIL_PARAMS = struct.Struct('<HHH') # format, width, height
+_PARAMS = struct.Struct('<H')           # encoding
+
+class BlockType(IntEnum):
+    FILE_METADATA = 0
+    GCODE = 1
+    SLICER_METADATA = 2
+    PRINTER_METADATA = 3
+    PRINT_METADATA = 4
+    THUMBNAIL = 5
+
+class Compression(IntEnum):
+    NONE = 0
+    DEFLATE = 1
+    HEATSHRINK_11_4 = 2
+    HEATSHRINK_12_4 = 3
+
+class GCodeEncoding(IntEnum):
+    NONE = 0
+    MEATPACK = 1
+    MEATPACK_COMMENTS = 2
+
+class ChecksumType(IntEnum):
+    NONE = 0
+    CRC32 = 1
+
+_CHECKSUM_SIZE = {ChecksumType.NONE: 0, ChecksumType.CRC32: 4}
+_HEATSHRINK_PARAMS = {Compression.HEATSHRINK_11_4: (11, 4), Compression.HEATSHRINK_12_4: (12, 4)}
+_THUMBNAIL_FORMATS = {0: 'PNG', 1: 'JPG', 2: 'QOI'}
+
+class BGCodeException(Exception): pass
+
+def is_bgcode(path: str | Path) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+# -----------------------------------------------------------------------------
+# Heatshrink
+# -----------------------------------------------------------------------------
+
+def _read_bits(bits: NDArray[np.uint8], starts: NDArray[np.int64], n: int) -> NDArray[np.int64]:
+    out = np.zeros(len(starts), dtype=np.int64)
+    for k in range(n):
+        out = (out << 1) | bits[starts + k]
+    return out
+
+def _walk(nxt: NDArray[np.int64], cursors: NDArray[np.int64], stops: NDArray[np.int64], record: bool = False) -> tuple[NDArray[np.int64], list[NDArray[np.int64]]]:
+    # advances every cursor token by token until it reaches its stop, all cursors in one numpy step
+    visited: list[NDArray[np.int64]] = []
+    while True:
+        active = cursors < stops
+        if not active.any(): return cursors, visited
+        if record: visited.append(np.where(active, cursors, -1))
+        cursors = np.where(active, nxt[cursors], cursors)
+
+def _token_starts(bits: NDArray[np.uint8], n_bits: int, backref_bits: int) -> NDArray[np.int64]:
+    # a token starts where the previous one ends. The bits are cut into blocks; every block is walked from
+    # each offset a token may enter it at, which gives its exit for every entry. Chaining the exits finds
+    # the true entries, and one more walk from those lists the tokens, so Python only loops per token
+    # within a block and once per block, never once per token of the whole stream.
+    # nxt: start of the token after every bit position; positions past the end, where cursors may stop, map to themselves
+    nxt = np.arange(n_bits + backref_bits) + np.where(bits[:n_bits + backref_bits] == 1, 9, backref_bits)
+    nxt[n_bits:] = np.arange(n_bits, n_bits + backref_bits)
+    block = max(256, int(np.sqrt(n_bits * 9.0)))
+    firsts = np.arange(0, n_bits, block, dtype=np.int64)
+    stops = np.minimum(firsts + block, n_bits)
+
+    entry_offsets = np.arange(backref_bits, dtype=np.int64)
+    cursors = (firsts[:, None] + entry_offsets).ravel()
+    exits, _ = _walk(nxt, cursors, np.repeat(stops, backref_bits))
+    exit_offset = (exits.reshape(len(firsts), backref_bits) - np.append(firsts[1:], n_bits)[:, None]).tolist()
+
+    entries = [0]
+    for j in range(len(firsts) - 1):
+        entries.append(int(firsts[j + 1]) + exit_offset[j][entries[-1] - int(firsts[j])])
+
+    _, visited = _walk(nxt, np.array(entries, dtype=np.int64), stops, record=True)
+    if not visited: return np.zeros(0, dtype=np.int64)
+    steps = np.stack(visited, axis=1) # (blocks, steps), blocks and steps in stream order
+    pos = steps[steps >= 0]
+    if len(pos) and nxt[pos[-1]] > n_bits: pos = pos[:-1] # trailing padding bits
+    return pos
+
+def heatshrink_decode(data: bytes, window_sz2: int, lookahead_sz2: int, size: int) -> bytes:
+    # LZSS bitstream, MSB first: '1' + 8 bit literal, or '0' + index + count back-reference
+    if not data or not size: return b''
+
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    n_bits = len(bits)
+    backref_bits = 1 + window_sz2 + lookahead_sz2
+    bits = np.concatenate((bits, np.zeros(backref_bits, dtype=np.uint8)))
+
+    pos = _token_starts(bits, n_bits, backref_bits)
+
+    is_literal = bits[pos] == 1
+    literal = _read_bits(bits, pos + 1, 8)
+    index = _read_bits(bits, pos + 1, window_sz2) + 1
+    count = _read_bits(bits, pos + 1 + window_sz2, lookahead_sz2) + 1
+
+    lengths = np.where(is_literal, 1, count)
+    total = int(lengths.sum())
+    token = np.repeat(np.arange(len(pos)), lengths)
+    j = np.arange(total, dtype=np.int64)
+
+    # every output byte either is a literal or copies an earlier output byte;
+    # resolve the copy chains by pointer doubling (references before the start hit the zeroed window)
+    lit_byte = is_literal[token]
+    ref = np.where(lit_byte, j, j - index[token])
+    ref = np.append(np.where(ref < 0, total, ref), total)
+    values = np.append(np.where(lit_byte, literal[token], 0), 0).astype(np.uint8)
+
+    while True:
+        nxt = ref[ref]
+        if np.array_equal(nxt, ref): break
+        ref = nxt
+
+    return values[ref[:min(total, size)]].tobytes()
+
+# -----------------------------------------------------------------------------
+# MeatPack
+# -----------------------------------------------------------------------------
+
+_MP_SIGNAL = 0xFF
+_MP_ENABLE_PACKING = 251
+_MP_DISABLE_PACKING = 250
+_MP_RESET_ALL = 249
+_MP_ENABLE_NO_SPACES = 247
+_MP_DISABLE_NO_SPACES = 246
+
+_MP_FULL = 0xF
+_MP_NEWLINE = 0xC
+_MP_TABLE = np.frombuffer(b'0123456789. \nGX\0', dtype=np.uint8)
+_MP_TABLE_NO_SPACES = np.frombuffer(b'0123456789.E\nGX\0', dtype=np.uint8)
+
+_GLINE_PARAMETERS = np.zeros(256, dtype=bool)
+_GLINE_PARAMETERS[list(b'XYZEFIJRPWHCA')] = True
+
+def _unpack(data: NDArray[np.uint8], no_spaces: bool) -> NDArray[np.uint8]:
+    # every packed byte holds two 4 bit characters (low nibble first); 0xF means that
+    # character follows as a full byte. Whether a byte is packed depends on the bytes
+    # before it, which is a 3 state automaton: solved with a prefix scan over its transitions.
+    n = len(data)
+    if not n: return np.empty(0, dtype=np.uint8)
+
+    lo, hi = data & 0xF, data >> 4
+    full_follow = np.where(lo == _MP_NEWLINE, 0, (lo == _MP_FULL).astype(np.int64) + (hi == _MP_FULL))
+
+    # transitions[i][s]: bytes still to skip after byte i, when s were left before it
+    transitions = np.empty((n, 3), dtype=np.int64)
+    transitions[:, 0] = full_follow
+    transitions[:, 1] = 0
+    transitions[:, 2] = 1
+
+    d = 1
+    while d < n:
+        transitions[d:] = np.take_along_axis(transitions[d:], transitions[:-d], axis=1)
+        d *= 2
+
+    skip = np.concatenate(([0], transitions[:-1, 0]))
+    packed = np.flatnonzero(skip == 0)
+
+    table = _MP_TABLE_NO_SPACES if no_spaces else _MP_TABLE
+    padded = np.concatenate((data, np.zeros(2, dtype=np.uint8)))
+    full1, full2 = padded[packed + 1], padded[packed + 2]
+    p_lo, p_hi = lo[packed], hi[packed]
+    lo_full, hi_full = p_lo == _MP_FULL, p_hi == _MP_FULL
+
+    first = np.where(lo_full, full1, table[p_lo])
+    second = np.where(lo_full, np.where(hi_full, full2, table[p_hi]), np.where(hi_full, full1, table[p_hi]))
+    has_second = lo_full | (p_lo != _MP_NEWLINE)
+
+    out = np.stack((first, second), axis=1).ravel()
+    return out[np.stack((np.ones(len(packed), dtype=bool), has_second), axis=1).ravel()]
+
+def _restore_spaces(text: NDArray[np.uint8]) -> NDArray[np.uint8]:
+    # packing drops the spaces of G lines and empty lines; put back what the tokenizer relies on
+    if not len(text): return text
+
+    is_nl = text == 0x0A
+    prev = np.concatenate(([0x0A], text[:-1]))
+    line_start = np.flatnonzero(prev == 0x0A)
+    line_id = np.cumsum(prev == 0x0A) - 1
+    g_line = text[line_start] == ord('G')
+
+    insert = g_line[line_id] & _GLINE_PARAMETERS[text] & (prev != 0x20)
+    keep = ~(is_nl & (prev == 0x0A) & (np.arange(len(text)) > 0))
+
+    n_out = np.where(keep, 1 + insert, 0)
+    out = np.full(int(n_out.sum()), 0x20, dtype=np.uint8)
+    out[np.cumsum(n_out)[keep] - 1] = text[keep]
+    return out
+
+def meatpack_decode(data: bytes) -> bytes:
+    buf = np.frombuffer(data, dtype=np.uint8)
+
+    # split on signal sequences (0xFF 0xFF <command>), which only toggle modes
+    ff = np.flatnonzero((buf[:-1] == _MP_SIGNAL) & (buf[1:] == _MP_SIGNAL))
+    pieces: list[NDArray[np.uint8]] = []
+    packing, no_spaces = False, False
+    p = 0
+    for s in ff.tolist():
+        if s < p: continue
+        pieces.append(_unpack(buf[p:s], no_spaces) if packing else buf[p:s])
+        cmd = int(buf[s + 2]) if s + 2 < len(buf) else -1
+        if cmd == _MP_ENABLE_PACKING: packing = True
+        elif cmd in (_MP_DISABLE_PACKING, _MP_RESET_ALL): packing = False
+        elif cmd == _MP_ENABLE_NO_SPACES: no_spaces = True
+        elif cmd == _MP_DISABLE_NO_SPACES: no_spaces = False
+        p = s + 3
+    pieces.append(_unpack(buf[p:], no_spaces) if packing else buf[p:])
+
+    return _restore_spaces(np.concatenate(pieces)).tobytes()
+
+# -----------------------------------------------------------------------------
+# Block reader
+# -----------------------------------------------------------------------------
+
+class Block():
+    def __init__(self, block_type: int, compression: int, uncompressed_size: int, compressed_size: int, params: tuple[int, ...], offset: int, header: bytes) -> None:
+        self.type: int = block_type
+        self.compression: int = compression
+        self.uncompressed_size: int = uncompressed_size
+        self.compressed_size: int = compressed_size
+        self.params: tuple[int, ...] = params
+        self.offset: int = offset # of the data
+        self.header: bytes = header # raw header and parameters, covered by the block checksum
+        self.end: int = offset + compressed_size # file offset of the next block, set by the reader
+
+class Thumbnail():
+    def __init__(self, image_format: str, width: int, height: int, data: bytes) -> None:
+        self.format: str = image_format
+        self.width: int = width
+        self.height: int = height
+        self.data: bytes = data
+
+def _decompress(block: Block, data: bytes) -> bytes:
+    if block.compression == Compression.NONE:
+        return data
+    if block.compression == Compression.DEFLATE:
+        decompressor = zlib.decompressobj()
+        return decompressor.decompress(data, block.uncompressed_size) + decompressor.flush()
+    if block.compression in _HEATSHRINK_PARAMS:
+        window_sz2, lookahead_sz2 = _HEATSHRINK_PARAMS[Compression(block.compression)]
+        return heatshrink_decode(data, window_sz2, lookahead_sz2, block.uncompressed_size)
+    raise BGCodeException(f'Unsupported compression {block.compression}')
+
+def _parse_ini(data: bytes) -> dict[str, str]:
+    out: dict[str, str] = {}
+    for line in data.decode('utf-8', errors='replace').splitlines():
+        key, sep, value = line.partition('=')
+        if sep: out[key.strip()] = value.strip()
+    return out
+
+class BGCodeReader():
+    metadata: dict[int, dict[str, str]]
+    thumbnails: list[Thumbnail]
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = path
+        self.metadata = {}
+        self.thumbnails = []
+        self._file: BinaryIO | None = None
+
+    def __enter__(self) -> 'BGCodeReader':
+        self._file = open(self.path, 'rb')
+        header = self._file.read(_FILE_HEADER.size)
+        magic, self.version, checksum_type = _FILE_HEADER.unpack(header) if len(header) == _FILE_HEADER.size else (b'', 0, 0)
+        if magic != MAGIC or checksum_type not in _CHECKSUM_SIZE:
+            self.__exit__()
+            raise BGCodeException(f'{self.path} is not a supported binary G-code file')
+        self._checksum_size = _CHECKSUM_SIZE[ChecksumType(checksum_type)]
+        return self
+
+    def __exit__(self, *_) -> None:
+        if self._file: self._file.close()
+        self._file = None
+
+    def _blocks(self) -> Iterator[Block]:
+        f = self._file
+        assert f
+        while header := f.read(_BLOCK_HEADER.size):
+            if len(header) < _BLOCK_HEADER.size: break
+            block_type, compression, uncompressed_size = _BLOCK_HEADER.unpack(header)
+            compressed_size = uncompressed_size
+            if compression != Compression.NONE:
+                size_bytes = f.read(_COMPRESSED_SIZE.size)
+                compressed_size, = _COMPRESSED_SIZE.unpack(size_bytes)
+                header += size_bytes
+
+            params_struct = _THUMBNAIL_PARAMS if block_type == BlockType.THUMBNAIL else _PARAMS
+            params_bytes = f.read(params_struct.size)
+            params = params_struct.unpack(params_bytes)
+
+            block = Block(block_type, compression, uncompressed_size, compressed_size, params, f.tell(), header + params_bytes)
+            block.end += self._checksum_size
+            yield block
+            f.seek(block.end)
+
+    def _read(self, block: Block) -> bytes:
+        # raises BGCodeException on a truncated block or, when the file has checksums, a CRC mismatch
+        assert self._file
+        self._file.seek(block.offset)
+        data = self._file.read(block.compressed_size + self._checksum_size)
+        if len(data) != block.compressed_size + self._checksum_size:
+            raise BGCodeException(f'{self.path}: truncated block at offset {block.offset}')
+        if self._checksum_size:
+            data, stored = data[:block.compressed_size], data[block.compressed_size:]
+            if zlib.crc32(data, zlib.crc32(block.header)) != int.from_bytes(stored, 'little'):
+                raise BGCodeException(f'{self.path}: checksum mismatch in block at offset {block.offset}')
+        return _decompress(block, data)
+
+    def read_gcode(self, block: Block) -> bytes:
+        # decoded ASCII G-code of one G-code block
+        data = self._read(block)
+        if block.params[0] in (GCodeEncoding.MEATPACK, GCodeEncoding.MEATPACK_COMMENTS):
+            data = meatpack_decode(data)
+        return data
+
+    def gcode_blocks(self, offset: int | None = None) -> Iterator[Block]:
+        # G-code blocks from file offset (a Block.end), or from the first block of a freshly opened reader
+        assert self._file
+        if offset is not None: self._file.seek(offset)
+        for block in self._blocks():
+            if block.type == BlockType.GCODE: yield block
+
+    def iter_gcode(self) -> Iterator[bytes]:
+        # decoded ASCII G-code, one block at a time; metadata and thumbnails are collected on the way
+        for block in self._blocks():
+            if block.type == BlockType.GCODE:
+                yield self.read_gcode(block)
+            elif block.type == BlockType.THUMBNAIL:
+                image_format, width, height = block.params
+                self.thumbnails.append(Thumbnail(_THUMBNAIL_FORMATS.get(image_format, str(image_format)), width, height, self._read(block)))
+            else:
+                self.metadata[block.type] = _parse_ini(self._read(block))
+
+    def read_metadata(self) -> dict[int, dict[str, str]]:
+        # metadata and thumbnails only: stops at the first G-code block, which follows them
+        for block in self._blocks():
+            if block.type == BlockType.GCODE: break
+            if block.type == BlockType.THUMBNAIL:
+                image_format, width, height = block.params
+                self.thumbnails.append(Thumbnail(_THUMBNAIL_FORMATS.get(image_format, str(image_format)), width, height, self._read(block)))
+            else:
+                self.metadata[block.type] = _parse_ini(self._read(block))
+        return self.metadata
+
+# -----------------------------------------------------------------------------
+# SegmentData
+# -----------------------------------------------------------------------------
+
+def parse_bgcode(path: str | Path, chunk_size: int):
+    from .gcode import SegmentData
+    from .gcode_tokenizer import ParserState, parse_block
+
+    mesh = SegmentData(0)
+    state = ParserState()
+    pending = bytearray()
+    consumed = 0 # decoded bytes already parsed
+
+    def flush(n: int) -> None:
+        nonlocal consumed
+        buf = np.frombuffer(bytes(pending[:n]), dtype=np.uint8)
+        block = parse_block(buf, 0, len(buf), state)
+        block.offset += np.uint64(consumed)
+        mesh.extend(block)
+        consumed += n
+        del pending[:n]
+
+    with BGCodeReader(path) as reader:
+        for text in reader.iter_gcode():
+            pending += text
+            if len(pending) >= chunk_size:
+                cut = pending.rfind(b'\n') + 1
+                if cut: flush(cut)
+    if pending: flush(len(pending))
+
+    return mesh
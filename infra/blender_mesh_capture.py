@@ -5,26 +5,71 @@ import zlib, struct
 from functools import cached_property
 
 import numpy as np
-from numpy import dtype, float64
 from numpy.typing import NDArray
 
-from typing import Any, cast
+from typing import cast
 
-from ..core.geometry import crc32_array
+from ..core.geometry import crc32_array, merge_exact_duplicates
 from ..infra.blender_bridge import get_all_children
+from ..registry import register_handler
 
 from .. import TYPES_NAME
 
 class MeshCaptureException(Exception): pass
 
+# object session_uid -> number of depsgraph updates that touched its geometry or transform
+_update_counts: dict[int, int] = {}
+# object session_uid -> (key, verts, faces, displacement) of its last capture
+_capture_cache: dict[int, tuple[tuple, NDArray[np.float32], NDArray[np.int32], NDArray[np.float32]]] = {}
+
+def _prune_removed_objects() -> None:
+    # deleted objects report no update; their entries go once a dict outgrows bpy.data.objects
+    alive = {o.session_uid for o in bpy.data.objects}
+    for cache in (_update_counts, _capture_cache):
+        for uid in [uid for uid in cache if uid not in alive]:
+            del cache[uid]
+
+@register_handler("depsgraph_update_post")
+def _count_object_updates(scene, depsgraph) -> None:
+    for update in depsgraph.updates:
+        if isinstance(update.id, Object) and (update.is_updated_geometry or update.is_updated_transform):
+            uid = update.id.original.session_uid
+            _update_counts[uid] = _update_counts.get(uid, 0) + 1
+    if len(_update_counts) > len(bpy.data.objects):
+        _prune_removed_objects()
+
+@register_handler("load_post")
+@register_handler("undo_post")
+@register_handler("redo_post")
+def _clear_capture_cache(*args) -> None:
+    # objects can change without a depsgraph update being reported
+    _update_counts.clear()
+    _capture_cache.clear()
+
+def capture_object(obj: Object, depsgraph, scale: float) -> tuple[NDArray[np.float32], NDArray[np.int32], NDArray[np.float32]]:
+    # transformed, indexed triangles of obj, reused until a depsgraph update touches the object or the frame changes
+    # (animation does not report updates); callers must not modify them
+    uid = obj.original.session_uid
+    key = (_update_counts.get(uid, 0), depsgraph.scene.frame_current, scale, tuple(map(tuple, obj.matrix_world)))
+    cached = _capture_cache.get(uid)
+    if cached and cached[0] == key:
+        return cached[1], cached[2], cached[3]
+
+    verts, faces, displacement = objects_to_indexed([obj.evaluated_get(depsgraph)], depsgraph, scale)
+    _capture_cache[uid] = (key, verts, faces, displacement)
+    if len(_capture_cache) > len(bpy.data.objects):
+        _prune_removed_objects()
+    return verts, faces, displacement
+
 class SlicingObject():
     name: str
     parent: str
     object_type: str
     extruder: str
     modifiers: list[dict]
-    displacement: NDArray[float64]
-    mesh: NDArray[float64]
+    verts: NDArray[np.float32]          # (V, 3)
+    faces: NDArray[np.int32]            # (T, 3) indices into verts
+    displacement: NDArray[np.float32]   # (T, 3) US_displace per triangle corner, empty without the attribute
 
     def __init__(self, obj: Object, parent: str) -> None:
         if not bpy.context.scene: raise Exception('No scene currently open!')
@@ -37,19 +82,20 @@ class SlicingObject():
 
         depsgraph = bpy.context.evaluated_depsgraph_get()
         scene_scale: float = bpy.context.scene.unit_settings.scale_length
-        eval_objects = obj.evaluated_get(depsgraph)
 
-        self.mesh, self.displacement = objects_to_tris([eval_objects], 1000 * scene_scale)
+        self.verts, self.faces, self.displacement = capture_object(obj, depsgraph, 1000 * scene_scale)
 
     def offset(self, offset: NDArray):
-        self.mesh += offset
+        # not in place, the captured arrays are shared with the capture cache
+        self.verts = self.verts + np.asarray(offset, dtype=np.float32)
 
     @property
     def checksum(self) -> int:
         import json
 
         buf = bytearray()
-        buf.extend(struct.pack(">I", crc32_array(self.mesh)))
+        buf.extend(struct.pack(">I", crc32_array(self.verts)))
+        buf.extend(struct.pack(">I", crc32_array(self.faces)))
         buf.extend(struct.pack(">I", zlib.crc32(self.name.encode("utf-8"))))
         buf.extend(struct.pack(">I", zlib.crc32(self.parent.encode("utf-8"))))
         buf.extend(struct.pack(">I", zlib.crc32(self.object_type.encode("utf-8"))))
@@ -62,19 +108,19 @@ class SlicingObject():
         return zlib.crc32(buf) & 0xFFFFFFFF
 
     @property
-    def height(self) -> float: return self.mesh[:, :3, 2].max()
+    def height(self) -> float: return float(self.verts[:, 2].max())
 
     @property
-    def min_x(self) -> float: return self.mesh[:, :3, 0].min()
+    def min_x(self) -> float: return float(self.verts[:, 0].min())
 
     @property
-    def max_x(self) -> float: return self.mesh[:, :3, 0].max()
+    def max_x(self) -> float: return float(self.verts[:, 0].max())
 
     @property
-    def min_y(self) -> float: return self.mesh[:, :3, 1].min()
+    def min_y(self) -> float: return float(self.verts[:, 1].min())
 
     @property
-    def max_y(self) -> float: return self.mesh[:, :3, 1].max()
+    def max_y(self) -> float: return float(self.verts[:, 1].max())
 
     @property
     def min_xy(self) -> NDArray: return np.array([self.min_x, self.min_y, 0.0])
@@ -91,7 +137,7 @@ class SlicingCollection():
 
     def __init__(self, objs: list[Object], parent: str):
         self.objects = [SlicingObject(obj, parent) for obj in objs]
-        self.objects = [o for o in self.objects if o.mesh.size]
+        self.objects = [o for o in self.objects if o.faces.size]
         self.name = parent
 
     def offset(self, offset: NDArray):
@@ -103,17 +149,13 @@ class SlicingCollection():
 
     @property
     def height(self) -> float:
-        height_all = [so.height for so in self.objects if np.any(so.mesh)]
+        height_all = [so.height for so in self.objects if so.faces.size]
         if not height_all: return 0
         return max(height_all)
 
-    @property
-    def meshes(self) -> list[NDArray[float]]:
-        return [o.mesh for o in self.objects]
-
     @cached_property
     def mesh_lengths_ids(self) -> NDArray:
-        return np.array([len(m) for m in self.meshes])
+        return np.array([len(o.faces) for o in self.objects])
 
     @cached_property
     def mesh_start_ids(self) -> NDArray:
@@ -127,50 +169,31 @@ class SlicingCollection():
         return starts + lengths - 1
 
     @cached_property
-    def all_verts(self) -> NDArray:
-        all_verts = np.vstack(self.meshes)[:, :3, :]
-        return all_verts.reshape(-1, 3)
-
-    @cached_property
-    def unique_verts(self) -> tuple[np.ndarray, np.ndarray]:
-        verts_list = []
-        idxs = []
-        offset = 0
-
-        for mesh in self.meshes:
-            verts = mesh[:, :3, :].reshape(-1, 3)
-
-            void_dtype = np.dtype((np.void, verts.dtype.itemsize * verts.shape[1]))
-            verts_void = verts.view(void_dtype).ravel()
-
-            unique_voids, inv = np.unique(verts_void, return_inverse=True)
-
-            unique_verts = unique_voids.view(verts.dtype).reshape(-1, 3)
-
-            verts_list.append(unique_verts)
-            idxs.append(inv.reshape(-1, 3) + offset)
-
-            offset += unique_verts.shape[0]
-
-        all_verts = np.concatenate(verts_list, axis=0)
-        all_idxs  = np.vstack(idxs)
-        return all_verts, all_idxs
+    def indexed_mesh(self) -> tuple[NDArray[np.float32], NDArray[np.int32]]:
+        # (verts, faces) of all objects, faces offset into the shared vertex array; captures are indexed already, nothing is deduplicated
+        if not self.objects:
+            return np.zeros((0, 3), dtype=np.float32), np.zeros((0, 3), dtype=np.int32)
+        counts = np.array([len(o.verts) for o in self.objects])
+        offsets = np.insert(np.cumsum(counts)[:-1], 0, 0)
+        all_verts = np.concatenate([o.verts for o in self.objects], axis=0)
+        all_faces = np.concatenate([o.faces + off for o, off in zip(self.objects, offsets.tolist())], axis=0)
+        return all_verts, all_faces
 
     @property
     def min_x(self) -> float | None:
-        return min([so.min_x for so in self.objects if np.any(so.mesh)], default=None)
+        return min([so.min_x for so in self.objects if so.faces.size], default=None)
 
     @property
     def max_x(self) -> float | None:
-        return max([so.max_x for so in self.objects if np.any(so.mesh)], default=None)
+        return max([so.max_x for so in self.objects if so.faces.size], default=None)
 
     @property
     def min_y(self) -> float | None:
-        return min([so.min_y for so in self.objects if np.any(so.mesh)], default=None)
+        return min([so.min_y for so in self.objects if so.faces.size], default=None)
 
     @property
     def max_y(self) -> float | None:
-        return max([so.max_y for so in self.objects if np.any(so.mesh)], default=None)
+        return max([so.max_y for so in self.objects if so.faces.size], default=None)
 
     @property
     def min_xy(self) -> NDArray | None:
@@ -284,86 +307,61 @@ class SlicingGroup():
         if self.min_xy is None or self.max_xy is None: return np.array([.0, .0, .0])
         return (self.min_xy + self.max_xy) / 2.0
 
-class TriMesh():
-    mesh: Mesh
-    length_verts: int
-    length_tris: int
-    matrix_world: Any
-
-    def __init__(self, mesh: Mesh, v: int, t: int, m) -> None:
-        self.mesh = mesh
-        self.length_verts = v
-        self.length_tris = t
-        self.matrix_world = m
-
-def objects_to_tris(objects: list[Object], scale) -> (np.ndarray[tuple[int, int, int], dtype[np.float64]], np.ndarray[tuple[int, int], dtype[np.float64]]):
-    tris_count: int = 0
-    meshes: list[TriMesh] = []
+def objects_to_indexed(objects: list[Object], depsgraph, scale, merge_duplicates: bool = True) -> tuple[NDArray[np.float32], NDArray[np.int32], NDArray[np.float32]]:
+    # float32 vertices in world space times scale, int32 triangles straight from loop_triangles.
+    # merge_duplicates joins unconnected vertices at identical positions (e.g. unmerged STL imports) per object
+    verts_all: list[NDArray[np.float32]] = []
+    faces_all: list[NDArray[np.int32]] = []
+    displ_all: list[NDArray[np.float32]] = []
+    offset = 0
 
     for obj in objects:
         try:
-            depsgraph = bpy.context.evaluated_depsgraph_get()
             mesh: Mesh = obj.to_mesh(depsgraph=depsgraph, preserve_all_data_layers=True)
         except: continue
         mesh.calc_loop_triangles()
 
-        cur_length = len(mesh.loop_triangles)
-        if cur_length == 0: continue
+        length_tris = len(mesh.loop_triangles)
+        if length_tris == 0:
+            obj.to_mesh_clear()
+            continue
 
-        tris_count += cur_length
-        
-        meshes += [TriMesh(
-            mesh,
-            len(mesh.vertices),
-            len(mesh.loop_triangles),
-            np.array(obj.matrix_world.transposed())
-        )]
-
-    tris_flat: np.ndarray[tuple[int], dtype[np.float64]] = np.empty(tris_count * 4 * 3, dtype=dtype(np.float64))
-    tris: np.ndarray[tuple[int, int, int], dtype[np.float64]] = tris_flat.reshape(-1,  4,  3)
-    displ_tri = tris_flat.reshape(-1,  3)
-
-    col_idx = 0
-    for trimesh in meshes:
-        tris_v_i_flat: np.ndarray[tuple[int], dtype[np.int32]] = np.empty(trimesh.length_tris * 3, dtype=dtype(np.int32))
-        tris_v_n_flat: np.ndarray[tuple[int], dtype[np.float64]] = np.empty(trimesh.length_tris * 3, dtype=dtype(np.float64))
-        tris_verts_flat: np.ndarray[tuple[int], dtype[np.float64]] = np.empty(trimesh.length_verts * 3, dtype=dtype(np.float64))
-
-        trimesh.mesh.loop_triangles.foreach_get("vertices", tris_v_i_flat)
-        trimesh.mesh.loop_triangles.foreach_get("normal", tris_v_n_flat)
-        trimesh.mesh.vertices.foreach_get("co", tris_verts_flat)
-
-        tris_v_i: np.ndarray[tuple[int, int], dtype[np.int32]] = tris_v_i_flat.reshape((-1, 3))
-        tris_v_n: np.ndarray[tuple[int, int], dtype[np.float64]] = tris_v_n_flat.reshape((-1, 3))
-        tris_verts: np.ndarray[tuple[int, int], dtype[np.float64]] = tris_verts_flat.reshape((-1, 3))
-
-        if trimesh.mesh.attributes.get("US_displace"):
-            tri_loops_flat = np.empty(trimesh.length_tris * 3, dtype=np.int32)
-            trimesh.mesh.loop_triangles.foreach_get("loops", tri_loops_flat) # per-tri-corner loop index
-            tri_loops = tri_loops_flat.reshape((-1, 3)) # (n_tris, 3)
-
-            displ_attr = cast(FloatAttribute, trimesh.mesh.attributes["US_displace"])
+        faces = np.empty(length_tris * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("vertices", faces)
+        faces = faces.reshape(-1, 3)
+        co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", co)
+        co = co.reshape(-1, 3)
+
+        if mesh.attributes.get("US_displace"):
+            tri_loops = np.empty(length_tris * 3, dtype=np.int32)
+            mesh.loop_triangles.foreach_get("loops", tri_loops) # per-tri-corner loop index
+
+            displ_attr = cast(FloatAttribute, mesh.attributes["US_displace"])
             displ_all_loops = np.empty(len(displ_attr.data), dtype=np.float32)
             displ_attr.data.foreach_get("value", displ_all_loops)
+            displ_all.append(displ_all_loops[tri_loops.reshape(-1, 3)])
 
-            displ_tri: NDArray = displ_all_loops[tri_loops]
+        obj.to_mesh_clear()
 
-        homogeneous_verts: NDArray[float64] = np.hstack((tris_verts, np.ones((tris_verts.shape[0], 1)))) # type: ignore
-        tx_verts = homogeneous_verts @ trimesh.matrix_world
-        tx_verts = (tx_verts[:, :3]) * scale
+        # keep only the vertices used by triangles, renumbered in order (no sort)
+        used = np.zeros(len(co), dtype=bool)
+        used[faces] = True
+        remap = np.cumsum(used, dtype=np.int32) - 1
+        co = co[used]
+        faces = remap[faces]
+        if merge_duplicates:
+            co, faces = merge_exact_duplicates(co, faces)
 
-        homogeneous_norm: NDArray[float64] = np.hstack((tris_v_n, np.ones((tris_v_n.shape[0], 1)))) # type: ignore
-        tx_norm = homogeneous_norm @ trimesh.matrix_world.T
-        tx_norm = tx_norm[:, :3]
-        tx_norm = tx_norm / np.linalg.norm(tx_norm, axis=1, keepdims=True)
-        tx_norm = tx_norm[:, np.newaxis, :]
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        tx = (co @ matrix[:3, :3].T + matrix[:3, 3]) * scale
 
-        tx_tris = tx_verts[tris_v_i]
-        
-        tris_coords_and_norm: NDArray[float64] = np.concatenate((tx_tris, tx_norm), axis=1)
-        
-        tris[col_idx:col_idx + trimesh.length_tris,:] = tris_coords_and_norm
-        
-        col_idx += trimesh.length_tris
+        verts_all.append(tx.astype(np.float32))
+        faces_all.append(faces + offset)
+        offset += len(co)
+
+    if not faces_all:
+        return np.zeros((0, 3), dtype=np.float32), np.zeros((0, 3), dtype=np.int32), np.zeros((0, 3), dtype=np.float32)
 
-    return tris, displ_tri
\ No newline at end of file
+    displacement = np.concatenate(displ_all) if displ_all else np.zeros((0, 3), dtype=np.float32)
+    return np.concatenate(verts_all), np.concatenate(faces_all).astype(np.int32, copy=False), displacement
@@ -22,14 +22,6 @@ def calculate_md5(file_paths) -> str:
                 md5_hash.update(byte_block)
     return md5_hash.hexdigest()
 
-import mmap
-def count_lines_mmap(path: str | Path, filter=b'\n'):
-    with open(path, 'rb') as f:
-        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
-        n = mm[:].count(filter)
-        mm.close()
-    return n
-
 def err_to_tempfile(text) -> str:
     import os, tempfile
     print(text)
@@ -1,6 +1,11 @@
 import mmap
+import os
 import numpy as np
 import re
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    from .gcode_layers import LayerTable
 
 labels = [
     'Perimeter', #1
@@ -29,14 +34,110 @@ class SegmentData():
         self.extrusion = np.zeros((n), dtype=np.float16)
         self.feature_type = np.empty((n), dtype=np.uint8)
         self.pt_id_of_seg = np.full((n, 2), -1, dtype=np.int64)
+        self.line = np.zeros((n), dtype=np.uint32) # 0-based source line of the move
+        self.offset = np.zeros((n), dtype=np.uint64) # byte offset of that line (in the decoded text for bgcode)
+
+        # layer changes (;Z: comments) and the first segment after each
+        self.layer_z = np.zeros((0), dtype=np.float32)
+        self.layer_start = np.zeros((0), dtype=np.int64)
+
+    _fields: tuple[str, ...] = ('pos', 'width', 'height', 'fan_speed', 'temperature', 'extrusion', 'feature_type', 'pt_id_of_seg', 'line', 'offset')
+    _layer_fields: tuple[str, ...] = ('layer_z', 'layer_start')
+
+    @classmethod
+    def from_arrays(cls, n: int, arrays: dict[str, np.ndarray]) -> 'SegmentData':
+        mesh = cls(0)
+        for name in cls._fields:
+            setattr(mesh, name, arrays[name])
+        for name in cls._layer_fields:
+            if name in arrays: setattr(mesh, name, arrays[name])
+        mesh.length = mesh.seg_count = n
+        return mesh
+
+    def _resize(self, n: int) -> None:
+        for name in self._fields:
+            arr: np.ndarray = getattr(self, name)
+            arr.resize((n, *arr.shape[1:]), refcheck=False)
+        self.pt_id_of_seg[self.length:] = -1
+        self.length = n
+
+    def reserve(self, n: int) -> None:
+        # grows geometrically, so repeated extends stay amortised O(n)
+        if n <= self.length: return
+        self._resize(max(n, int(self.length * 1.5)))
+
+    def extend(self, other: 'SegmentData') -> None:
+        a, b = self.seg_count, self.seg_count + other.seg_count
+        self.reserve(b)
+        for name in self._fields:
+            getattr(self, name)[a:b] = getattr(other, name)[:other.seg_count]
+        self.layer_z = np.concatenate((self.layer_z, other.layer_z))
+        self.layer_start = np.concatenate((self.layer_start, other.layer_start + a))
+        self.seg_count = b
+
+    def trim(self) -> None:
+        if self.length != self.seg_count: self._resize(self.seg_count)
+
+    def link_points(self) -> None:
+        # segment i goes from point i-1 to point i
+        ids = np.arange(self.seg_count)
+        self.pt_id_of_seg[:self.seg_count, 1] = ids
+        self.pt_id_of_seg[:self.seg_count, 0] = ids - 1
+        if self.seg_count: self.pt_id_of_seg[0] = 0, 0
+
+    def extruding_segments(self, features: Iterable[str] | None = None) -> np.ndarray:
+        # segments that extrude while moving, of the given feature types (all when None).
+        # The first move only sets the start position; G0 moves and moves that stay in place
+        # (unretracts, or a G1 to the current position) are left out
+        n = self.seg_count
+        keep = (self.extrusion[1:n] > 0) & np.any(self.pos[1:n] != self.pos[:max(n - 1, 0)], axis=1)
+        if features is not None:
+            keep &= np.isin(self.feature_type[1:n], [labels.index(f) for f in features])
+        return np.flatnonzero(keep) + 1
+
+    def layers(self) -> 'LayerTable':
+        from .gcode_layers import LayerTable
+        return LayerTable.from_segments(self)
+
+CHUNK_SIZE: int = 16 * 1024 * 1024
+
+def parse_gcode(path, chunk_size: int = CHUNK_SIZE) -> SegmentData:
+    # chunk_size bounds the parser temporaries; 0 parses the whole file in one block.
+    # ASCII files are parsed along their shared line index, which later source lookups reuse.
+    # Binary G-code is decoded block by block and parsed as it streams in.
+    from .gcode_tokenizer import ParserState, iter_chunks, parse_block
+    from .gcode_index import gcode_index
+    from .bgcode import MAGIC, parse_bgcode
 
-def parse_gcode(path) -> SegmentData:
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size: return SegmentData(0)
+
+        if f.read(len(MAGIC)) == MAGIC:
+            mesh = parse_bgcode(path, chunk_size or CHUNK_SIZE)
+            mesh.trim()
+            mesh.link_points()
+            return mesh
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            index = gcode_index(path, mm)
+            buf = np.frombuffer(mm, dtype=np.uint8)
+            mesh = SegmentData(0)
+            mesh.reserve(len(index.opcodes[b'G0']) + len(index.opcodes[b'G1']))
+            state = ParserState()
+            for lo, hi in iter_chunks(mm, chunk_size):
+                mesh.extend(parse_block(buf, lo, hi, state, index))
+            del buf
+
+    mesh.trim()
+    mesh.link_points()
+    return mesh
+
+def parse_gcode_regex(path) -> SegmentData:
+    # reference implementation, kept for benchmarking against parse_gcode
     with open(path, "r+b") as f:
         mm: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
-    from .filesystem import count_lines_mmap
-    mesh = SegmentData(count_lines_mmap(path, b'\nG1'))
-    
     labels_idx = labels.index
 
     x: float = .0
@@ -60,15 +161,16 @@ def parse_gcode(path) -> SegmentData:
     # groups: 1:cmd/comment 2:x 3:y 4:z 5:e 6:f 7:p 8:s
 
     lst = pattern.findall(mm)
+    mesh = SegmentData(sum(1 for m in lst if m[1] in (b'G0', b'G1')))
 
     for m in lst:
-        if m[1] == b'G1':
+        if m[1] in (b'G0', b'G1'):
             if v:=m[2]: x = float(v[1:])
             if v:=m[3]: y = float(v[1:])
             if v:=m[4]: z = float(v[1:])
             mesh.pos[i] = x, y, z
 
-            if v:=m[5]: mesh.extrusion[i] = float(v[1:])
+            if (v:=m[5]) and m[1] == b'G1': mesh.extrusion[i] = float(v[1:])
 
             mesh.pt_id_of_seg[i] = i - 1, i
             
@@ -121,19 +223,64 @@ def parse_gcode(path) -> SegmentData:
 
     return mesh
 
-from typing import Any
-import re
-from re import Match, Pattern
-
-def parse_gcode_value(file_path, name) -> str | Any | None:
-    pattern: Pattern[Any] = re.compile(rb'^;? ?' + name.encode('utf-8') + rb' ?= ?(.+)$')
-    with open(file_path, 'rb') as file:  # Open in binary mode
-        lines: list[bytes] = file.readlines()[::-1] # Read all lines and reverse the order
-        for line in lines:
-            try:
-                val: Match[bytes] | None = pattern.search(line)
-                if val:
-                    return val.group(1).decode()
-            except UnicodeDecodeError:
-                continue
-    return None
\ No newline at end of file
+FOOTER_BLOCK_SIZE: int = 64 * 1024
+# the footer ends after this many lines in a row without a '; key = value' comment
+FOOTER_GAP_LINES: int = 64
+
+# (path, (size, mtime_ns), metadata) of the most recently read file only
+_metadata_cache: tuple[str, tuple[int, int], dict[str, str]] | None = None
+
+def _read_footer(file_path, block_size: int) -> dict[str, str]:
+    # Walks the file backwards from EOF, collecting '; key = value' comments. Stray G-code lines and
+    # plain comments between them (post-processing scripts, end G-code) are skipped; the footer is
+    # assumed to be over once FOOTER_GAP_LINES lines in a row yield no value.
+    values: dict[str, str] = {}
+    gap: int = 0
+    with open(file_path, 'rb') as file:
+        pos: int = file.seek(0, os.SEEK_END)
+        tail: bytes = b''
+        while pos > 0:
+            step: int = min(block_size, pos)
+            pos -= step
+            file.seek(pos)
+            lines: list[bytes] = (file.read(step) + tail).split(b'\n')
+            tail = lines.pop(0) if pos else b'' # first line may be partial, carried into the next block
+
+            for line in reversed(lines):
+                line = line.strip()
+                if not line: continue
+                key, sep, value = line[1:].partition(b'=')
+                if not line.startswith(b';') or not sep:
+                    gap += 1
+                    if gap >= FOOTER_GAP_LINES: return values
+                    continue
+                gap = 0
+                values.setdefault(key.strip().decode('utf-8', errors='replace'), value.strip().decode('utf-8', errors='replace'))
+    return values
+
+def _read_bgcode_metadata(file_path) -> dict[str, str]:
+    # a damaged or unsupported file has no stats rather than failing the slice
+    from .bgcode import BGCodeException, BGCodeReader, BlockType
+    try:
+        with BGCodeReader(file_path) as reader:
+            metadata = reader.read_metadata()
+    except BGCodeException as e:
+        print(f"Could not read G-code metadata: {e}")
+        return {}
+    values: dict[str, str] = {}
+    for block_type in (BlockType.SLICER_METADATA, BlockType.FILE_METADATA, BlockType.PRINTER_METADATA, BlockType.PRINT_METADATA):
+        values.update(metadata.get(block_type, {}))
+    return values
+
+def read_gcode_metadata(file_path, block_size: int = FOOTER_BLOCK_SIZE) -> dict[str, str]:
+    global _metadata_cache
+    from .bgcode import is_bgcode
+    st = os.stat(file_path)
+    key = (st.st_size, st.st_mtime_ns)
+    cached = _metadata_cache
+    if cached and cached[0] == str(file_path) and cached[1] == key:
+        return cached[2]
+
+    values = _read_bgcode_metadata(file_path) if is_bgcode(file_path) else _read_footer(file_path, block_size)
+    _metadata_cache = (str(file_path), key, values)
+    return values
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from .gcode import SegmentData, parse_gcode
+
+# Bump whenever the sidecar layout or the parser output changes
+SEGMENT_CACHE_VERSION: int = 5
+
+_MAGIC = b'USSEGS'
+_PREFIX = struct.Struct('<6sII') # magic, version, header length
+_ALIGN = 64
+
+class SegmentCacheException(Exception): pass
+
+def sidecar_path(gcode_path: str | Path) -> Path:
+    gcode_path = Path(gcode_path)
+    return gcode_path.with_name(gcode_path.name + '.segments')
+
+def _source_key(gcode_path: str | Path) -> dict[str, int]:
+    st = os.stat(gcode_path)
+    return {'source_size': st.st_size, 'source_mtime_ns': st.st_mtime_ns}
+
+def _aligned(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+def save_segments(gcode_path: str | Path, mesh: SegmentData) -> None:
+    # written to a temp file of its own and moved into place, so concurrent writers never share a partial file
+    n = mesh.seg_count
+    arrays = {name: np.ascontiguousarray(getattr(mesh, name)[:n]) for name in SegmentData._fields}
+    arrays.update({name: np.ascontiguousarray(getattr(mesh, name)) for name in SegmentData._layer_fields})
+
+    fields: dict[str, list] = {}
+    offset = 0
+    for name, arr in arrays.items():
+        fields[name] = [offset, arr.dtype.str, list(arr.shape)]
+        offset = _aligned(offset + arr.nbytes)
+
+    header = json.dumps({**_source_key(gcode_path), 'seg_count': n, 'fields': fields}).encode('utf-8')
+    data_start = _aligned(_PREFIX.size + len(header))
+
+    path = sidecar_path(gcode_path)
+    tmp_path: str | None = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name + '.', suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            f.write(_PREFIX.pack(_MAGIC, SEGMENT_CACHE_VERSION, len(header)))
+            f.write(header)
+            for name, arr in arrays.items():
+                f.seek(data_start + fields[name][0])
+                arr.tofile(f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        if tmp_path and os.path.exists(tmp_path): os.remove(tmp_path)
+        raise SegmentCacheException(f"Could not write segment cache {path}: {e}") from e
+
+def load_segments(gcode_path: str | Path) -> SegmentData | None:
+    # memory-maps a valid sidecar, None if missing, stale or from another version
+    path = sidecar_path(gcode_path)
+    if not (os.path.exists(path) and os.path.exists(gcode_path)): return None
+
+    try:
+        with open(path, 'rb') as f:
+            magic, version, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != _MAGIC or version != SEGMENT_CACHE_VERSION: return None
+            header = json.loads(f.read(header_len))
+    except (OSError, ValueError, struct.error):
+        return None
+
+    if any(header.get(k) != v for k, v in _source_key(gcode_path).items()): return None
+
+    reference = SegmentData(0)
+    fields: dict = header['fields']
+    if set(fields) != {*SegmentData._fields, *SegmentData._layer_fields}: return None
+    if any(np.dtype(fields[name][1]) != getattr(reference, name).dtype for name in fields): return None
+
+    n = int(header['seg_count'])
+    if not n: return reference
+
+    data_start = _aligned(_PREFIX.size + header_len)
+    arrays = {
+        name: np.memmap(path, dtype=np.dtype(dtype), mode='c', offset=data_start + offset, shape=tuple(shape))
+        if np.prod(shape) else np.zeros(shape, dtype=np.dtype(dtype))
+        for name, (offset, dtype, shape) in fields.items()
+    }
+    return SegmentData.from_arrays(n, arrays)
+
+def parse_gcode_cached(gcode_path: str | Path, on_cache_error: Callable[[SegmentCacheException], None] | None = None) -> SegmentData:
+    # a sidecar that cannot be written does not fail the parse: the error goes to on_cache_error, raised without one
+    mesh = load_segments(gcode_path)
+    if mesh is None:
+        mesh = parse_gcode(gcode_path)
+        try:
+            save_segments(gcode_path, mesh)
+        except SegmentCacheException as e:
+            if on_cache_error is None: raise
+            on_cache_error(e)
+    return mesh
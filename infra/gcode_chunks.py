@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy.typing import NDArray
+
+if TYPE_CHECKING:
+    from .gcode import SegmentData
+    from .gcode_layers import LayerTable
+
+CHUNK_BAND_LAYERS = 8       # layers per band
+CHUNK_TILE = 20.0           # XY tile size, mm
+CHUNK_MIN_SEGMENTS = 4096   # tile changes only split a chunk once per this many segments
+
+# corner selectors of a box: 0 takes lo, 1 takes hi
+_BOX = np.array([[i & 1, (i >> 1) & 1, (i >> 2) & 1] for i in range(8)], dtype=bool)
+
+class ChunkTable():
+    # contiguous segment ranges [first, end) split at layer bands and XY tiles, with the bounding box of their geometry
+    first: NDArray[np.int64]
+    end: NDArray[np.int64]
+    lo: NDArray[np.float32]     # (C, 3)
+    hi: NDArray[np.float32]     # (C, 3)
+
+    def __init__(self, first: NDArray[np.int64], end: NDArray[np.int64], lo: NDArray[np.float32], hi: NDArray[np.float32]) -> None:
+        self.first = first
+        self.end = end
+        self.lo = lo
+        self.hi = hi
+
+    @classmethod
+    def from_segments(cls, mesh: SegmentData, layers: LayerTable, band_layers: int = CHUNK_BAND_LAYERS, tile: float = CHUNK_TILE, min_segments: int = CHUNK_MIN_SEGMENTS) -> 'ChunkTable':
+        # chunks stay in print order so each one is a single instance range of the records texture
+        n = mesh.seg_count
+        if n == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return cls(empty, empty, np.zeros((0, 3), dtype=np.float32), np.zeros((0, 3), dtype=np.float32))
+
+        pos = mesh.pos[:n].astype(np.float32, copy=False)
+        if len(layers):
+            band = np.repeat(np.arange(len(layers)) // band_layers, layers.segments)
+        else:
+            band = np.zeros(n, dtype=np.int64)
+        tile_xy = np.floor(pos[:, :2] / tile).astype(np.int64)
+
+        # every band change splits, tile changes only at the first one of each min_segments block
+        idx = np.arange(1, n)
+        band_breaks = idx[band[1:] != band[:-1]]
+        tile_breaks = idx[np.any(tile_xy[1:] != tile_xy[:-1], axis=1)]
+        _, first_in_block = np.unique(tile_breaks // min_segments, return_index=True)
+        breaks = np.union1d(band_breaks, tile_breaks[first_in_block]).astype(np.int64)
+        first = np.concatenate(([0], breaks)).astype(np.int64)
+        end = np.append(breaks, n).astype(np.int64)
+
+        # segment i spans points i-1 and i, sized by the width and height of point i-1
+        prev = np.maximum(np.arange(n) - 1, 0)
+        pad = np.empty((n, 3), dtype=np.float32)
+        pad[:, 0] = pad[:, 1] = mesh.width[prev] * 0.5
+        pad[:, 2] = mesh.height[prev] * 0.5
+        seg_lo = np.minimum(pos, pos[prev]) - pad
+        seg_hi = np.maximum(pos, pos[prev]) + pad
+        return cls(first, end, np.minimum.reduceat(seg_lo, first), np.maximum.reduceat(seg_hi, first))
+
+    def __len__(self) -> int:
+        return len(self.first)
+
+    def box_corners(self, transform: NDArray[np.float32], scale: float) -> NDArray[np.float32]:
+        # (C, 8, 4) homogeneous corners of every bounding box in scene space
+        corners = np.where(_BOX[None], self.hi[:, None], self.lo[:, None])
+        out = np.ones((len(self), 8, 4), dtype=np.float32)
+        out[..., :3] = (corners + transform) * scale
+        return out
+
+    @staticmethod
+    def visible(corners: NDArray[np.float32], mvp: NDArray[np.float32]) -> NDArray[np.bool_]:
+        # conservative frustum test: a box is culled only when all its corners lie outside the same clip plane
+        clip = corners @ mvp.T
+        w = clip[..., 3:]
+        xyz = clip[..., :3]
+        outside = ((xyz < -w).all(axis=1) | (xyz > w).all(axis=1)).any(axis=1)
+        return ~outside
+
+    def runs(self, visible: NDArray[np.bool_], start: int, end: int) -> list[tuple[int, int]]:
+        # [a, b) ranges of the visible chunks within [start, end), neighbouring chunks merged into one draw
+        a = np.maximum(self.first, start)
+        b = np.minimum(self.end, end)
+        keep = visible & (a < b)
+        a, b = a[keep], b[keep]
+        if not len(a): return []
+        split = np.flatnonzero(a[1:] != b[:-1]) + 1
+        firsts = np.concatenate(([0], split))
+        lasts = np.append(split - 1, len(b) - 1)
+        return list(zip(a[firsts].tolist(), b[lasts].tolist()))
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import mmap
+import os
+from pathlib import Path
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .gcode_tokenizer import INDEXED_OPCODES, iter_chunks, line_table, match_opcode, skip_blanks
+
+INDEX_CHUNK_SIZE: int = 16 * 1024 * 1024
+
+class GcodeIndex():
+    # line table of an ASCII G-code file, built over an mmap view without copying it.
+    # Line numbers are 0-based; the parser, the preview and the source lookups share one instance per file.
+    line_starts: NDArray[np.int64]          # byte offset of every line, plus the file size as sentinel
+    opcodes: dict[bytes, NDArray[np.int64]] # sorted line numbers of each of INDEXED_OPCODES
+
+    def __init__(self, path: str, key: tuple[int, int], line_starts: NDArray[np.int64], opcodes: dict[bytes, NDArray[np.int64]]) -> None:
+        self.path = path
+        self.key = key
+        self.line_starts = line_starts
+        self.opcodes = opcodes
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_starts) - 1
+
+    def lines_in(self, lo: int, hi: int) -> tuple[int, int]:
+        # [first, last) lines starting in the byte range [lo, hi)
+        first, last = np.searchsorted(self.line_starts[:-1], (lo, hi))
+        return int(first), int(last)
+
+    def line_table(self, buf: NDArray[np.uint8], first: int, last: int) -> tuple[NDArray[np.int64], NDArray[np.int64]]:
+        # (starts, ends) of lines [first, last) like tokenizer.line_table, without scanning for newlines again
+        starts = self.line_starts[first:last]
+        nxt = self.line_starts[first + 1:last + 1]
+        ends = nxt - (buf[nxt - 1] == 0x0A)
+        cr = (ends > starts) & (buf[np.maximum(ends - 1, 0)] == 0x0D)
+        return starts, ends - cr
+
+    def opcode_lines(self, opcode: bytes, first: int, last: int) -> NDArray[np.int64]:
+        # lines of opcode within [first, last), counted from first
+        lines = self.opcodes[opcode]
+        a, b = np.searchsorted(lines, (first, last))
+        return lines[a:b] - first
+
+    def line_span(self, first: int, last: int) -> tuple[int, int]:
+        # [start, end) byte range of lines [first, last), newlines included
+        return int(self.line_starts[first]), int(self.line_starts[last])
+
+def build_index(path: str, key: tuple[int, int], mm: mmap.mmap, chunk_size: int = INDEX_CHUNK_SIZE) -> GcodeIndex:
+    buf = np.frombuffer(mm, dtype=np.uint8)
+    starts: list[NDArray[np.int64]] = []
+    found: dict[bytes, list[NDArray[np.int64]]] = {op: [] for op in INDEXED_OPCODES}
+    line_base = 0
+    for lo, hi in iter_chunks(mm, chunk_size):
+        block_starts, ends = line_table(buf, lo, hi)
+        code_starts, first = skip_blanks(buf, block_starts, ends)
+        for op in INDEXED_OPCODES:
+            found[op].append(match_opcode(buf, code_starts, ends, op, first) + line_base)
+        starts.append(block_starts)
+        line_base += len(block_starts)
+    del buf
+
+    starts.append(np.array([len(mm)], dtype=np.int64))
+    empty = np.zeros(0, dtype=np.int64)
+    return GcodeIndex(path, key, np.concatenate(starts), {op: np.concatenate(v) if v else empty for op, v in found.items()})
+
+# only the most recently used file is kept
+_index: GcodeIndex | None = None
+
+def gcode_index(path: str | Path, mm: mmap.mmap | None = None) -> GcodeIndex:
+    # index of an ASCII G-code file, rebuilt when the file changes; mm is an open mapping of it, when the caller has one
+    global _index
+    st = os.stat(path)
+    key = (st.st_size, st.st_mtime_ns)
+    index = _index
+    if index and index.path == str(path) and index.key == key:
+        return index
+
+    if mm is not None:
+        index = build_index(str(path), key, mm)
+    elif not st.st_size:
+        index = GcodeIndex(str(path), key, np.zeros(1, dtype=np.int64), {op: np.zeros(0, dtype=np.int64) for op in INDEXED_OPCODES})
+    else:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            index = build_index(str(path), key, m)
+    _index = index
+    return index
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy.typing import NDArray
+
+if TYPE_CHECKING:
+    from .gcode import SegmentData
+
+def _layers_from_moves(mesh: SegmentData) -> tuple[NDArray[np.float32], NDArray[np.int64]]:
+    # without ;Z: comments, a layer starts at every extrusion above all previous ones
+    n = mesh.seg_count
+    ext = np.flatnonzero(mesh.extrusion[:n] > 0)
+    z = mesh.pos[ext, 2]
+    if not len(z): return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    top = np.maximum.accumulate(z)
+    new = np.concatenate(([True], top[1:] > top[:-1]))
+    return z[new].astype(np.float32), ext[new]
+
+class LayerTable():
+    # one row per layer in print order: z, first and last segment (inclusive), layer height and segment count
+    z: NDArray[np.float32]
+    first: NDArray[np.int64]
+    last: NDArray[np.int64]
+    height: NDArray[np.float32]
+
+    segments: NDArray[np.int64]
+
+    def __init__(self, z: NDArray[np.float32], first: NDArray[np.int64], last: NDArray[np.int64], height: NDArray[np.float32]) -> None:
+        self.z = z
+        self.first = first
+        self.last = last
+        self.height = height
+        self.segments = last - first + 1
+
+        # running bounds keep range queries conservative when z is not monotonic (sequential printing)
+        self._z_max = np.maximum.accumulate(z) if len(z) else z
+        self._z_min = np.minimum.accumulate(z[::-1])[::-1] if len(z) else z
+        # sorted boundaries half a layer below/above each layer, for snapping z filters
+        self.bounds = np.unique(np.concatenate((z - height * 0.5, z[-1:] + height[-1:] * 0.5))).astype(np.float32)
+
+    @classmethod
+    def from_segments(cls, mesh: SegmentData) -> 'LayerTable':
+        n = mesh.seg_count
+        z, start = mesh.layer_z, mesh.layer_start
+        if not len(z): z, start = _layers_from_moves(mesh)
+
+        # markers without moves in between: the last one wins; markers after the last move are dropped
+        keep = np.append(start[1:] != start[:-1], True) & (start < n)
+        z, start = z[keep].astype(np.float32), start[keep].astype(np.int64)
+        if len(start): start[0] = 0 # start G-code belongs to the first layer
+
+        last = np.append(start[1:], n) - 1
+        height = np.diff(z, prepend=np.float32(0))
+        height = np.where(height > 0, height, z).astype(np.float32)
+
+        return cls(z, start, last, height)
+
+    def __len__(self) -> int:
+        return len(self.z)
+
+    def layer_range(self, zmin: float, zmax: float) -> tuple[int, int]:
+        # [lo, hi) of the layers with zmin < z < zmax; may include lower layers printed after higher ones, (0, 0) when empty
+        lo = int(np.searchsorted(self._z_max, zmin, side='right'))
+        hi = int(np.searchsorted(self._z_min, zmax, side='left'))
+        return lo, max(lo, hi)
+
+    def snap(self, z: float) -> float:
+        # nearest boundary between layers, so z range filters keep or drop whole layers; the lower one on a tie, z itself when empty
+        if not len(self): return z
+        i = int(np.clip(np.searchsorted(self.bounds, z), 1, len(self.bounds) - 1))
+        lo, hi = float(self.bounds[i - 1]), float(self.bounds[i])
+        return lo if z - lo <= hi - z else hi
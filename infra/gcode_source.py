@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import os
+from bisect import bisect_right
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .bgcode import Block, BGCodeReader
+
+# Source lookups: text of the G-code lines around a segment, for the preview inspector
+
+_LINE_WINDOW = 512
+_DECODED_BLOCKS = 4 # decoded G-code blocks kept per file
+
+class _BlockTable():
+    # decoded text offset of every binary G-code block read so far, filled as lookups move further into the file
+    def __init__(self, path: str, key: tuple[int, int]) -> None:
+        self.path: str = path
+        self.key: tuple[int, int] = key
+        self.starts: list[int] = [0] # decoded offset of each block, plus the end of the last one
+        self.blocks: list[Block] = []
+        self.done: bool = False
+        self.texts: dict[int, bytes] = {} # block index -> decoded text, a few recent blocks only
+
+    def add(self, block: Block, text: bytes) -> None:
+        self.blocks.append(block)
+        self.starts.append(self.starts[-1] + len(text))
+        self._keep(len(self.blocks) - 1, text)
+
+    def text(self, reader: BGCodeReader, i: int) -> bytes:
+        if (text := self.texts.get(i)) is None:
+            text = reader.read_gcode(self.blocks[i])
+            self._keep(i, text)
+        return text
+
+    def _keep(self, i: int, text: bytes) -> None:
+        if len(self.texts) >= _DECODED_BLOCKS: self.texts.clear()
+        self.texts[i] = text
+
+# only the file being previewed is kept
+_block_table: _BlockTable | None = None
+
+def _read_bgcode_range(path: str | Path, lo: int, hi: int) -> bytes:
+    global _block_table
+    from .bgcode import BGCodeReader
+    st = os.stat(path)
+    key = (st.st_size, st.st_mtime_ns)
+    table = _block_table
+    if not table or table.path != str(path) or table.key != key:
+        table = _block_table = _BlockTable(str(path), key)
+
+    with BGCodeReader(path) as reader:
+        if not table.done and table.starts[-1] < hi:
+            for block in reader.gcode_blocks(table.blocks[-1].end if table.blocks else None):
+                table.add(block, reader.read_gcode(block))
+                if table.starts[-1] >= hi: break
+            else:
+                table.done = True
+
+        out = bytearray()
+        i = max(bisect_right(table.starts, lo) - 1, 0)
+        while i < len(table.blocks) and table.starts[i] < hi:
+            start = table.starts[i]
+            out += table.text(reader, i)[max(lo - start, 0):hi - start]
+            i += 1
+    return bytes(out)
+
+def _read_range(path: str | Path, lo: int, hi: int) -> bytes:
+    # bytes [lo, hi) of the G-code text; binary G-code is decoded only around the range
+    from .bgcode import is_bgcode
+    if is_bgcode(path):
+        return _read_bgcode_range(path, lo, hi)
+    with open(path, 'rb') as f:
+        f.seek(lo)
+        return f.read(hi - lo)
+
+def _read_indexed_lines(path: str | Path, line: int, before: int, after: int) -> list[tuple[int, str]]:
+    from .gcode_index import gcode_index
+    index = gcode_index(path)
+    first, last = max(line - before, 0), min(line + after + 1, index.line_count)
+    if first >= last: return []
+    lo, hi = index.line_span(first, last)
+    with open(path, 'rb') as f:
+        f.seek(lo)
+        data = f.read(hi - lo)
+    lines = data.split(b'\n')[:last - first]
+    return [(first + i, text.rstrip(b'\r').decode('utf-8', errors='replace')) for i, text in enumerate(lines)]
+
+def read_source_lines(path: str | Path, offset: int, line: int, before: int = 0, after: int = 0) -> list[tuple[int, str]]:
+    # (line number, text) for lines [line - before, line + after]; ASCII files read exactly those lines through
+    # their shared index, binary ones are read around the byte offset of `line` in the decoded text
+    from .bgcode import is_bgcode
+    if not is_bgcode(path):
+        return _read_indexed_lines(path, line, before, after)
+
+    window = _LINE_WINDOW * (max(before, after) + 1)
+    while True:
+        lo = max(offset - window, 0)
+        data = _read_range(path, lo, offset + window)
+        head = data[:offset - lo].split(b'\n')[:-1] # first entry is partial unless lo == 0
+        tail = data[offset - lo:].split(b'\n') # last entry is partial unless at EOF
+        at_eof = len(data) < offset + window - lo
+        if (lo == 0 or len(head) > before) and (at_eof or len(tail) > after + 1): break
+        window *= 2
+
+    if at_eof and tail and not tail[-1]: tail.pop()
+    head = head[max(len(head) - before, 0):] if before else []
+    lines = head + tail[:after + 1]
+    return [(line - len(head) + i, text.rstrip(b'\r').decode('utf-8', errors='replace')) for i, text in enumerate(lines)]
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import mmap
+from typing import TYPE_CHECKING, Iterator
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .gcode import SegmentData, labels
+
+if TYPE_CHECKING:
+    from .gcode_index import GcodeIndex
+
+# Byte constants
+_LF, _CR, _SP, _SC, _TAB = 0x0A, 0x0D, 0x20, 0x3B, 0x09
+_TERMINATORS = (0, _SP, _SC)
+
+_MAX_NUMBER_WIDTH = 32
+_FLOAT_BATCH = 1 << 16
+_UNKNOWN_LABEL = labels.index('Custom')
+
+# Opcodes parse_block reacts to, recorded by GcodeIndex
+INDEXED_OPCODES: tuple[bytes, ...] = (b'G0', b'G1', b'M104', b'M106', b'M109')
+
+class ParserState():
+    def __init__(self) -> None:
+        self.x: float = .0
+        self.y: float = .0
+        self.z: float = .0
+        self.width: float = .0
+        self.height: float = .0
+        self.fan: float = .0
+        self.temp: float = .0
+        self.feature_type: int = 0
+        self.line: int = 0 # lines consumed so far
+
+# -----------------------------------------------------------------------------
+# Chunking
+# -----------------------------------------------------------------------------
+
+def iter_chunks(mm: mmap.mmap, chunk_size: int) -> Iterator[tuple[int, int]]:
+    # (lo, hi) windows of about chunk_size bytes, always ending on a line boundary
+    size = len(mm)
+    lo = 0
+    while lo < size:
+        hi = min(lo + chunk_size, size) if chunk_size > 0 else size
+        if hi < size:
+            nl = mm.rfind(b'\n', lo, hi)
+            if nl == -1: nl = mm.find(b'\n', hi) # single line longer than a window
+            hi = size if nl == -1 else nl + 1
+        yield lo, hi
+        lo = hi
+
+# -----------------------------------------------------------------------------
+# Line table
+# -----------------------------------------------------------------------------
+
+def line_table(buf: NDArray[np.uint8], lo: int = 0, hi: int | None = None) -> tuple[NDArray[np.int64], NDArray[np.int64]]:
+    # (starts, ends) of every line in buf[lo:hi], ends exclude the newline and a trailing \r
+    hi = len(buf) if hi is None else hi
+    nl = np.flatnonzero(buf[lo:hi] == _LF) + lo
+    starts = np.concatenate((np.array([lo], dtype=np.int64), nl + 1))
+    ends = np.concatenate((nl, np.array([hi], dtype=np.int64)))
+    if starts[-1] >= hi:
+        starts, ends = starts[:-1], ends[:-1]
+
+    cr = (ends > starts) & (buf[np.maximum(ends - 1, 0)] == _CR)
+    return starts, ends - cr
+
+def byte_at(buf: NDArray[np.uint8], starts: NDArray[np.int64], ends: NDArray[np.int64], k: int) -> NDArray[np.uint8]:
+    # k-th byte of every line, 0 past the end of the line
+    pos = starts + k
+    ok = pos < ends
+    out = np.zeros(len(starts), dtype=np.uint8)
+    out[ok] = buf[pos[ok]]
+    return out
+
+def skip_blanks(buf: NDArray[np.uint8], starts: NDArray[np.int64], ends: NDArray[np.int64]) -> tuple[NDArray[np.int64], NDArray[np.uint8]]:
+    # starts moved past leading spaces and tabs, and the first byte after them (0 on blank lines)
+    first = byte_at(buf, starts, ends, 0)
+    sel = np.flatnonzero((first == _SP) | (first == _TAB))
+    if not len(sel): return starts, first
+
+    starts = starts.copy()
+    while len(sel):
+        starts[sel] += 1
+        first[sel] = byte_at(buf, starts[sel], ends[sel], 0)
+        sel = sel[(first[sel] == _SP) | (first[sel] == _TAB)]
+    return starts, first
+
+def match_prefix(buf: NDArray[np.uint8], starts: NDArray[np.int64], ends: NDArray[np.int64], prefix: bytes, first: NDArray[np.uint8] | None = None) -> NDArray[np.int64]:
+    # indices of the lines starting with prefix; first (byte 0 of every line) can be shared between calls
+    first = byte_at(buf, starts, ends, 0) if first is None else first
+    sel = np.flatnonzero(first == prefix[0])
+    for k, c in enumerate(prefix[1:], start=1):
+        sel = sel[byte_at(buf, starts[sel], ends[sel], k) == c]
+    return sel
+
+def match_opcode(buf: NDArray[np.uint8], starts: NDArray[np.int64], ends: NDArray[np.int64], opcode: bytes, first: NDArray[np.uint8] | None = None) -> NDArray[np.int64]:
+    # like match_prefix, but the opcode must be a whole word (G1 matches 'G1 X..' but not 'G10')
+    sel = match_prefix(buf, starts, ends, opcode, first)
+    return sel[np.isin(byte_at(buf, starts[sel], ends[sel], len(opcode)), _TERMINATORS)]
+
+# -----------------------------------------------------------------------------
+# Batched number conversion
+# -----------------------------------------------------------------------------
+
+def to_float(buf: NDArray[np.uint8], starts: NDArray[np.int64], ends: NDArray[np.int64]) -> NDArray[np.float64]:
+    # parses buf[starts[i]:ends[i]] as plain decimals, in cache sized batches
+    n = len(starts)
+    if n <= _FLOAT_BATCH: return _to_float(buf, starts, ends)
+
+    out = np.empty(n, dtype=np.float64)
+    for i in range(0, n, _FLOAT_BATCH):
+        out[i:i + _FLOAT_BATCH] = _to_float(buf, starts[i:i + _FLOAT_BATCH], ends[i:i + _FLOAT_BATCH])
+    return out
+
+def _to_float(buf: NDArray[np.uint8], starts: NDArray[np.int64], ends: NDArray[np.int64]) -> NDArray[np.float64]:
+    # column by column; the integer mantissa divided by an exact power of ten rounds exactly like float()
+    n = len(starts)
+    if not n: return np.empty(0, dtype=np.float64)
+
+    lengths = ends - starts
+    width = int(min(int(lengths.max()), _MAX_NUMBER_WIDTH))
+
+    mantissa = np.zeros(n, dtype=np.int64)
+    n_digits = np.zeros(n, dtype=np.int64)
+    n_frac = np.zeros(n, dtype=np.int64)
+    seen_dot = np.zeros(n, dtype=bool)
+    negative = np.zeros(n, dtype=bool)
+    bad = (lengths == 0) | (lengths > _MAX_NUMBER_WIDTH)
+
+    for k in range(width):
+        pos = starts + k
+        ok = pos < ends
+        c = np.zeros(n, dtype=np.uint8)
+        c[ok] = buf[pos[ok]]
+
+        is_digit = (c >= 0x30) & (c <= 0x39)
+        is_dot = c == 0x2E
+        is_sign = ((c == 0x2D) | (c == 0x2B)) if k == 0 else np.zeros(n, dtype=bool)
+
+        mantissa = np.where(is_digit, mantissa * 10 + (c.astype(np.int64) - 0x30), mantissa)
+        n_digits += is_digit
+        n_frac += is_digit & seen_dot
+        bad |= (is_dot & seen_dot) | (ok & ~(is_digit | is_dot | is_sign))
+        seen_dot |= is_dot
+        if k == 0: negative = c == 0x2D
+
+    bad |= (n_digits == 0) | (n_digits > 15)
+
+    out = mantissa / np.power(10.0, n_frac)
+    out[negative] *= -1
+
+    # anything unusual (exponents, malformed words) goes through float()
+    for i in np.flatnonzero(bad):
+        out[i] = _safe_float(bytes(buf[starts[i]:ends[i]])) if lengths[i] <= _MAX_NUMBER_WIDTH else np.nan
+    return out
+
+def _safe_float(s: bytes) -> float:
+    try:
+        return float(s)
+    except ValueError:
+        return np.nan
+
+# -----------------------------------------------------------------------------
+# Words and modal fill
+# -----------------------------------------------------------------------------
+
+def _code_ends(buf: NDArray[np.uint8], starts: NDArray[np.int64], ends: NDArray[np.int64], lo: int, hi: int) -> NDArray[np.int64]:
+    # end of the code part of each line (first ';' or line end)
+    sc = np.flatnonzero(buf[lo:hi] == _SC) + lo
+    if not len(sc): return ends
+    j = np.searchsorted(sc, starts)
+    cand = sc[np.minimum(j, len(sc) - 1)]
+    return np.where((j < len(sc)) & (cand < ends), cand, ends)
+
+class _Words():
+    # every ' <letter><number>' word found on the selected lines
+    def __init__(self, buf: NDArray[np.uint8], starts: NDArray[np.int64], code_ends: NDArray[np.int64], line_sel: NDArray[np.bool_], lo: int, hi: int, letters: bytes) -> None:
+        wanted = np.zeros(256, dtype=bool)
+        wanted[list(letters)] = True
+
+        sp = np.flatnonzero(buf[lo:hi - 1] == _SP) + lo
+        nxt = np.append(sp[1:], hi)
+        sel = wanted[buf[sp + 1]]
+        sp, nxt = sp[sel], nxt[sel]
+        line = np.searchsorted(starts, sp, side='right') - 1
+
+        keep = (line >= 0)
+        keep[keep] = line_sel[line[keep]]
+        keep[keep] &= (sp[keep] + 1) < code_ends[line[keep]]
+
+        self.line = line[keep]
+        self.start = sp[keep] + 2
+        self.end = np.minimum(nxt[keep], code_ends[self.line])
+        self.letter = buf[sp[keep] + 1]
+
+    def get(self, buf: NDArray[np.uint8], letter: bytes) -> tuple[NDArray[np.int64], NDArray[np.float64]]:
+        sel = np.flatnonzero(self.letter == ord(letter))
+        val = to_float(buf, self.start[sel], self.end[sel])
+        ok = ~np.isnan(val)
+        return self.line[sel[ok]], val[ok]
+
+def modal_fill(event_line: NDArray[np.int64], event_val: NDArray, target_line: NDArray[np.int64], initial, inclusive: bool = False) -> NDArray:
+    # value of the last event at or before each target line
+    k = np.searchsorted(event_line, target_line, side='right' if inclusive else 'left') - 1
+    if not len(event_val):
+        return np.full(len(target_line), initial)
+    return np.where(k >= 0, event_val[np.maximum(k, 0)], initial)
+
+def _last(event_val: NDArray, default):
+    return event_val[-1].item() if len(event_val) else default
+
+# -----------------------------------------------------------------------------
+# Block parser
+# -----------------------------------------------------------------------------
+
+def _comment_values(buf: NDArray[np.uint8], starts: NDArray[np.int64], ends: NDArray[np.int64], prefix: bytes, first: NDArray[np.uint8]) -> tuple[NDArray[np.int64], NDArray[np.float64]]:
+    sel = match_prefix(buf, starts, ends, prefix, first)
+    return sel, to_float(buf, starts[sel] + len(prefix), ends[sel])
+
+def _feature_types(buf: NDArray[np.uint8], starts: NDArray[np.int64], ends: NDArray[np.int64], first: NDArray[np.uint8]) -> tuple[NDArray[np.int64], NDArray[np.int64]]:
+    prefix = b';TYPE:'
+    sel = match_prefix(buf, starts, ends, prefix, first)
+    names = [bytes(buf[s:e]).decode(errors='replace') for s, e in zip(starts[sel] + len(prefix), ends[sel])]
+
+    lookup: dict[str, int] = {l: i for i, l in enumerate(labels)}
+    return sel, np.array([lookup.get(n, _UNKNOWN_LABEL) for n in names], dtype=np.int64)
+
+def parse_block(buf: NDArray[np.uint8], lo: int, hi: int, state: ParserState, index: GcodeIndex | None = None) -> SegmentData:
+    # parses the complete lines in buf[lo:hi]; state is read and advanced in place.
+    # Opcodes and comments are matched after leading blanks, offsets point at the line start.
+    # With the file's index, lines and opcodes are looked up instead of scanned for
+    if index is None:
+        starts, ends = line_table(buf, lo, hi)
+        code_starts, first = skip_blanks(buf, starts, ends)
+        find = lambda opcode: match_opcode(buf, code_starts, ends, opcode, first)
+    else:
+        first_line, last_line = index.lines_in(lo, hi)
+        starts, ends = index.line_table(buf, first_line, last_line)
+        code_starts, first = skip_blanks(buf, starts, ends)
+        find = lambda opcode: index.opcode_lines(opcode, first_line, last_line)
+
+    # G0 and G1 are both moves, only G1 extrudes
+    g1_lines = find(b'G1')
+    move_lines = np.union1d(find(b'G0'), g1_lines)
+    is_move = np.zeros(len(starts), dtype=bool)
+    is_move[move_lines] = True
+    is_g1 = np.zeros(len(starts), dtype=bool)
+    is_g1[g1_lines] = True
+    is_fan = np.zeros(len(starts), dtype=bool)
+    is_fan[find(b'M106')] = True
+    is_temp = np.zeros(len(starts), dtype=bool)
+    is_temp[find(b'M104')] = True
+    is_temp[find(b'M109')] = True
+
+    mesh = SegmentData(len(move_lines))
+    mesh.seg_count = len(move_lines)
+    mesh.line[:] = move_lines + state.line
+    mesh.offset[:] = starts[move_lines]
+    state.line += len(starts)
+
+    code_ends = _code_ends(buf, starts, ends, lo, hi)
+    words = _Words(buf, starts, code_ends, is_move | is_fan | is_temp, lo, hi, b'XYZES')
+
+    # positions from G0/G1 words, extrusion from G1 words
+    for axis, letter in enumerate((b'X', b'Y', b'Z')):
+        ev_line, ev_val = words.get(buf, letter)
+        sel = is_move[ev_line]
+        ev_line, ev_val = ev_line[sel], ev_val[sel]
+        initial = (state.x, state.y, state.z)[axis]
+        mesh.pos[:, axis] = modal_fill(ev_line, ev_val, move_lines, initial, inclusive=True)
+    if len(move_lines):
+        state.x, state.y, state.z = (float(v) for v in mesh.pos[-1])
+
+    ev_line, ev_val = words.get(buf, b'E')
+    has_e = is_g1[ev_line]
+    mesh.extrusion[np.searchsorted(move_lines, ev_line[has_e])] = ev_val[has_e]
+
+    # modal attributes, from comments and M-codes
+    ev_line, ev_val = _comment_values(buf, code_starts, ends, b';WIDTH:', first)
+    mesh.width[:] = modal_fill(ev_line, ev_val, move_lines, state.width)
+    state.width = _last(ev_val, state.width)
+
+    ev_line, ev_val = _comment_values(buf, code_starts, ends, b';HEIGHT:', first)
+    mesh.height[:] = modal_fill(ev_line, ev_val, move_lines, state.height)
+    state.height = _last(ev_val, state.height)
+
+    ev_line, ev_val = words.get(buf, b'S')
+    fan_sel = is_fan[ev_line]
+    mesh.fan_speed[:] = modal_fill(ev_line[fan_sel], ev_val[fan_sel], move_lines, state.fan)
+    state.fan = _last(ev_val[fan_sel], state.fan)
+
+    temp_sel = is_temp[ev_line]
+    mesh.temperature[:] = modal_fill(ev_line[temp_sel], ev_val[temp_sel], move_lines, state.temp)
+    state.temp = _last(ev_val[temp_sel], state.temp)
+
+    ev_line, ev_ft = _feature_types(buf, code_starts, ends, first)
+    mesh.feature_type[:] = modal_fill(ev_line, ev_ft, move_lines, state.feature_type)
+    state.feature_type = int(_last(ev_ft, state.feature_type))
+
+    ev_line, ev_val = _comment_values(buf, code_starts, ends, b';Z:', first)
+    mesh.layer_z = ev_val.astype(np.float32)
+    mesh.layer_start = np.searchsorted(move_lines, ev_line)
+
+    return mesh
@@ -5,7 +5,7 @@ import os
 import tempfile
 
 from pathlib import Path
-from typing import Any
+from typing import Any, TextIO
 
 from bpy.types import PropertyGroup
 
@@ -175,10 +175,9 @@ class ConfigWriter:
         self.config_dict: dict[str, str | list[str]] = conf
         self.temp_dir = tempfile.gettempdir()
     
-    def write_ini_3mf(self, config_local_path: Path):
-        with open(config_local_path, 'w') as file:
-            for key, val in dict(sorted(self.config_dict.items())).items():
-                file.write(f"; {key} = {val}\n")
+    def write_ini_3mf(self, file: TextIO):
+        for key, val in dict(sorted(self.config_dict.items())).items():
+            file.write(f"; {key} = {val}\n")
 
     def get(self, key: str, default: Any = None) -> str | list[str]:
         return self.config_dict[key]
@@ -175,9 +175,12 @@ class SlicerService:
         data = json.dumps([z.dict for z in self.z_gcodes] , sort_keys=True).encode("utf-8")
         return zlib.crc32(data) & 0xFFFFFFFF
 
-    def export_3mf(self, paths: SlicingPaths):
+    def export_3mf(self, paths: SlicingPaths, store_only: bool = False):
+        # store_only skips deflate for archives a local PrusaSlicer reads back right away
+        import zipfile
         from ..infra._3mf import prepare_3mf
-        prepare_3mf(paths.path_3mf_temp, self.slicing_objects, self.config_with_overrides, self.z_gcodes)
+        compression = zipfile.ZIP_STORED if store_only else zipfile.ZIP_DEFLATED
+        prepare_3mf(paths.path_3mf_temp, self.slicing_objects, self.config_with_overrides, self.z_gcodes, compression=compression)
 
     def open_in_prusaslicer(self, three_mf: Path):
         show_progress(self.pg, 100, 'Opening PrusaSlicer')
@@ -208,6 +211,7 @@ class SlicerService:
 
         # Open previews
         if os.path.exists(self.paths.path_gcode_temp) and mode in ["slice_and_preview", "slice_and_preview_internal"]:
+            # binary G-code goes to the external viewer until the decoder is checked against PrusaSlicer output
             if mode == "slice_and_preview" or '.bgcode' in metadata.gcode_path:
                 PreviewManager.show_external(self.paths.path_gcode_temp, self.prusaslicer_path)
             else:
@@ -274,11 +278,12 @@ class SlicerService:
             return {'FINISHED'}
 
         # Export 3MF
+        open_only = mode == "open" or not self.config_with_overrides
         show_progress(self.pg, 10, progress_text="Exporting 3MF...")
-        self.export_3mf(self.paths)
+        self.export_3mf(self.paths, store_only=not open_only)
 
         # Open-only mode
-        if mode == "open" or not self.config_with_overrides:
+        if open_only:
             show_progress(self.pg, 100, 'Opening PrusaSlicer')
             self.open_in_prusaslicer(self.paths.path_3mf_temp)
             self.pg.running = False
@@ -356,6 +361,7 @@ class PostSliceTimer:
 
         # Previews
         if os.path.exists(paths.path_gcode_temp) and mode in ["slice_and_preview", "slice_and_preview_internal"]:
+            # binary G-code goes to the external viewer until the decoder is checked against PrusaSlicer output
             if mode == "slice_and_preview" or '.bgcode' in metadata.gcode_path:
                 PreviewManager.show_external(paths.path_gcode_temp, prusaslicer_path)
             else:
@@ -9,7 +9,7 @@ from ..preferences.preferences import SlicerPreferences
 from ..props.enums import PrusaSlicerEnums
 from ..props.property_groups import PrusaSlicerTypes
 
-from bpy.props import BoolProperty, EnumProperty, FloatProperty, StringProperty, FloatVectorProperty
+from bpy.props import BoolProperty, EnumProperty, FloatProperty, IntProperty, StringProperty, FloatVectorProperty
 
 from .. import PACKAGE
 
@@ -174,6 +174,21 @@ def update_drawer(ref, context):
     if drawer.gcode:
         drawer.update()
 
+def update_drawer_z(ref, context):
+    from ..ui.gcode_preview import drawer
+    if drawer.gcode and ref.gcode_preview_snap_layers:
+        for prop in ('gcode_preview_min_z', 'gcode_preview_max_z'):
+            value = getattr(ref, prop)
+            snapped = drawer.gcode.layers.snap(value)
+            if abs(snapped - value) > 1e-4:
+                setattr(ref, prop, snapped) # runs this update again with the snapped value
+                return
+    update_drawer(ref, context)
+
+def update_drawer_source(ref, context):
+    from ..ui.gcode_preview import drawer
+    drawer.update_source(ref.gcode_preview_inspect)
+
 @register_class
 class SlicerWorkspacePropertyGroup(bpy.types.PropertyGroup):
     ## GCODE PREVIEW
@@ -189,8 +204,17 @@ class SlicerWorkspacePropertyGroup(bpy.types.PropertyGroup):
         ("color", "Color", ""),
     ], default=0, update=update_drawer)
 
-    gcode_preview_min_z: FloatProperty(name="Gcode preview minimum Z", min = 0, max = 1000, update=update_drawer)
-    gcode_preview_max_z: FloatProperty(name="Gcode preview maximum Z", min = 0, max = 1000, update=update_drawer)
+    gcode_preview_min_z: FloatProperty(name="Gcode preview minimum Z", min = 0, max = 1000, update=update_drawer_z)
+    gcode_preview_max_z: FloatProperty(name="Gcode preview maximum Z", min = 0, max = 1000, update=update_drawer_z)
+    gcode_preview_snap_layers: BoolProperty(name="Snap to layers", default=True, update=update_drawer_z)
+    gcode_preview_inspect: FloatProperty(name="Inspect move", min = 0, max = 1, subtype='FACTOR', update=update_drawer_source)
+
+    gcode_preview_lod: EnumProperty(name='Detail', items=[
+        ("full", "Full", "Extrusion boxes for every move"),
+        ("budget", "Budget", "Extrusion boxes for the top layers within the triangle budget, lines below"),
+        ("overview", "Overview", "Collinear moves merged into lines"),
+    ], default=0, update=update_drawer)
+    gcode_preview_tri_budget: IntProperty(name="Triangle budget", min = 10_000, default = 4_000_000, update=update_drawer)
 
     gcode_perimeter: BoolProperty(name="Perimeter", default=True, update=update_drawer)
     gcode_external_perimeter: BoolProperty(name="External Perimeter", default=True, update=update_drawer)
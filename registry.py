@@ -37,6 +37,28 @@ def blender_unregister_timers():
     for timer in _timer_registry:
         bpy.app.timers.unregister(timer)
 
+# HANDLERS
+_handler_registry: list[tuple[str, Callable[..., Any]]] = []
+
+def register_handler(event: str):
+    # decorator: appends the callback to bpy.app.handlers.<event>, kept across file loads
+    def decorator(clb: Callable[..., Any]):
+        _handler_registry.append((event, bpy.app.handlers.persistent(clb)))
+        return clb
+    return decorator
+
+def blender_register_handlers():
+    for event, handler in _handler_registry:
+        handlers = getattr(bpy.app.handlers, event)
+        if handler not in handlers:
+            handlers.append(handler)
+
+def blender_unregister_handlers():
+    for event, handler in _handler_registry:
+        handlers = getattr(bpy.app.handlers, event)
+        if handler in handlers:
+            handlers.remove(handler)
+
 import os
 
 from bpy.utils.previews import ImagePreviewCollection
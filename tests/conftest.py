@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# Make the addon's pure-python modules importable without Blender (infra/ is a namespace package)
+ADDON_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ADDON_FOLDER not in sys.path:
+    sys.path.insert(0, ADDON_FOLDER)
+
+@pytest.fixture
+def gcode_file(tmp_path):
+    from gcode_samples import sample_gcode
+    path = tmp_path / 'sample.gcode'
+    path.write_text(sample_gcode())
+    return path
@@ -0,0 +1,49 @@
+import random
+
+import numpy as np
+
+TYPES = ['Perimeter', 'External perimeter', 'Internal infill', 'Solid infill', 'Gap fill', 'Skirt/Brim', 'Custom']
+
+def sample_gcode(layers: int = 12, moves: int = 60) -> str:
+    # PrusaSlicer-like output with the cases the tokenizer has to agree with the regex parser on
+    rnd = random.Random(0)
+    out = [
+        '; generated for tests',
+        'M104 S215 ; set temperature',
+        'M109 S215',
+        'M107',
+        'G28 W ; home',
+        'G90',
+        'M83 ; relative extrusion',
+        'G92 E0',
+        'G1 Z.2 F720',
+        'G1 E2 F2400',
+    ]
+    z = 0.0
+    for layer in range(layers):
+        z = round(z + 0.2, 3)
+        out += [';LAYER_CHANGE', f';Z:{z}', ';HEIGHT:0.2', 'G1 E-.8 F2100', f'G1 Z{z} F720', 'G10', 'G11']
+        if layer % 2: out.append('G0 X100 Y100 F9000')
+        if layer == 2: out.append('M106 S255')
+        if layer == 6: out += ['  M106 S102', '\tM104 S205']
+        x, y = 100.0, 100.0
+        for m in range(moves):
+            if m % 20 == 0:
+                indent = '  ' if layer % 3 == 1 else ''
+                out += [f'{indent};TYPE:{rnd.choice(TYPES)}', f';WIDTH:{rnd.uniform(0.4, 0.5):.4f}', f'G1 X{x:.3f} Y{y:.3f} F9000', 'G1 E.8 F2100']
+            x = min(max(x + rnd.uniform(-5, 5), 0.0), 250.0)
+            y = min(max(y + rnd.uniform(-5, 5), 0.0), 210.0)
+            indent = ' ' * (m % 4 == 3) + '\t' * (m % 7 == 5)
+            comment = ' ; inline' if m % 11 == 0 else ''
+            out.append(f'{indent}G1 X{x:.3f} Y{y:.3f} E{rnd.uniform(0.01, 0.2):.5f}{comment}')
+        out += ['G92 E0', 'G1 F1200']
+    out += ['M107', 'M104 S0', '; filament used [g] = 3.70']
+    return '\n'.join(out) + '\n'
+
+def assert_same(mesh, ref, fields: tuple[str, ...] | None = None):
+    # per-segment arrays of two parses are equal; all fields, including the layer markers, unless given
+    from infra.gcode import SegmentData
+    assert mesh.seg_count == ref.seg_count
+    n = ref.seg_count
+    for name in fields or (*SegmentData._fields, *SegmentData._layer_fields):
+        np.testing.assert_array_equal(np.asarray(getattr(mesh, name))[:n], np.asarray(getattr(ref, name))[:n], err_msg=name)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from infra._3mf import TRIANGLE_XML, VERTEX_XML, _bulk_formattable, format_rows
+
+def reference(template, rows):
+    return ''.join(template % tuple(row) for row in rows.tolist()).encode('ascii')
+
+def check(template, rows):
+    assert _bulk_formattable(template, rows)
+    assert format_rows(template, rows) == reference(template, rows)
+
+@pytest.mark.parametrize('scale', [1e-7, 1e-3, 1.0, 250.0, 1e6, 1e11])
+def test_random_vertices(scale):
+    rng = np.random.default_rng(int(scale * 1e7) % 2**32)
+    check(VERTEX_XML, (rng.standard_normal((3000, 3)) * scale).astype(np.float32))
+
+def test_extreme_vertices():
+    below = np.float32(1e12) # 999999995904, the largest float32 the bulk path accepts
+    tiny = np.finfo(np.float32).smallest_subnormal
+    values = np.array([
+        0.0, -0.0, tiny, -tiny, np.finfo(np.float32).tiny, 5e-7, -5e-7, 4.9999997e-7, 5.0000004e-7,
+        0.0000015, 0.0000025, 0.9999995, 9.9999995, 0.5, 1.0, -1.0, 123456.789, 16777216.0, 16777217.0,
+        below, -below, 999999.9999995, 1e-6, -1e-6,
+    ], dtype=np.float32)
+    check(VERTEX_XML, np.stack([values, values[::-1], np.roll(values, 7)], axis=1))
+
+def test_every_float_in_a_rounding_window():
+    # consecutive float32 around a '%.6f' tie at 0.0000125 and at 1.0000005
+    for start in (np.float32(0.0000125), np.float32(1.0000005)):
+        col = start.view(np.uint32) + np.arange(-300, 300, dtype=np.int64)
+        values = col.astype(np.uint32).view(np.float32)
+        check(VERTEX_XML, np.stack([values, -values, values * 3], axis=1))
+
+def test_triangles():
+    rng = np.random.default_rng(1)
+    rows = rng.integers(0, 2**31 - 1, (3000, 3), dtype=np.int32)
+    rows[:4] = [[0, 0, 0], [1, 9, 10], [99, 100, 999], [2**31 - 1, 0, 1]]
+    check(TRIANGLE_XML, rows)
+
+def test_outside_the_bulk_domain():
+    for bad in (np.nan, np.inf, 2e12):
+        assert not _bulk_formattable(VERTEX_XML, np.array([[bad, 0, 0]], dtype=np.float32))
+    assert not _bulk_formattable(VERTEX_XML, np.zeros((1, 3), dtype=np.float64))
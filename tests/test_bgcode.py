@@ -0,0 +1,125 @@
+import struct
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from infra.bgcode import BGCodeException, BGCodeReader, BlockType, Compression, GCodeEncoding, heatshrink_decode, meatpack_decode
+from infra.gcode import parse_gcode, read_gcode_metadata
+from infra.gcode_source import read_source_lines
+from gcode_samples import assert_same, sample_gcode
+
+def heatshrink_reference(data: bytes, window_sz2: int, lookahead_sz2: int, size: int) -> bytes:
+    # straightforward sequential decoder
+    bits = ''.join(f'{b:08b}' for b in data)
+    out = bytearray()
+    i = 0
+    while len(out) < size:
+        if bits[i:i + 1] == '1' and i + 9 <= len(bits):
+            out.append(int(bits[i + 1:i + 9], 2))
+            i += 9
+        elif bits[i:i + 1] == '0' and i + 1 + window_sz2 + lookahead_sz2 <= len(bits):
+            index = int(bits[i + 1:i + 1 + window_sz2], 2) + 1
+            count = int(bits[i + 1 + window_sz2:i + 1 + window_sz2 + lookahead_sz2], 2) + 1
+            for _ in range(count):
+                out.append(out[-index] if index <= len(out) else 0)
+            i += 1 + window_sz2 + lookahead_sz2
+        else: break
+    return bytes(out[:size])
+
+def heatshrink_encode(data: bytes, window_sz2: int, lookahead_sz2: int) -> bytes:
+    # greedy encoder over a short search distance, enough to produce back-references
+    bits = []
+    i = 0
+    while i < len(data):
+        best_len, best_dist = 0, 0
+        for dist in range(1, min(i, 64) + 1):
+            n = 0
+            while n < 1 << lookahead_sz2 and i + n < len(data) and data[i + n - dist] == data[i + n]: n += 1
+            if n > best_len: best_len, best_dist = n, dist
+        if best_len >= 2:
+            bits.append(f'0{best_dist - 1:0{window_sz2}b}{best_len - 1:0{lookahead_sz2}b}')
+            i += best_len
+        else:
+            bits.append(f'1{data[i]:08b}')
+            i += 1
+    stream = ''.join(bits)
+    stream += '0' * (-len(stream) % 8)
+    return int(stream, 2).to_bytes(len(stream) // 8, 'big') if stream else b''
+
+def block(block_type: int, data: bytes, params: bytes, compression: int = Compression.NONE, payload: bytes | None = None) -> bytes:
+    header = struct.pack('<HHI', block_type, compression, len(data))
+    if compression != Compression.NONE: header += struct.pack('<I', len(payload))
+    body = header + params + (data if compression == Compression.NONE else payload)
+    return body + struct.pack('<I', zlib.crc32(body))
+
+def write_bgcode(path: Path, text: bytes, block_size: int = 4096) -> None:
+    out = struct.pack('<4sIH', b'GCDE', 1, 1)
+    out += block(BlockType.FILE_METADATA, b'Producer=test\n', struct.pack('<H', 0))
+    out += block(BlockType.PRINTER_METADATA, b'printer_model=MK4\n', struct.pack('<H', 0))
+    out += block(BlockType.SLICER_METADATA, b'layer_height=0.2\n', struct.pack('<H', 0), Compression.DEFLATE, zlib.compress(b'layer_height=0.2\n'))
+    for start in range(0, len(text), block_size):
+        chunk = text[start:start + block_size]
+        out += block(BlockType.GCODE, chunk, struct.pack('<H', GCodeEncoding.NONE), Compression.HEATSHRINK_12_4, heatshrink_encode(chunk, 12, 4))
+    path.write_bytes(out)
+
+@pytest.mark.parametrize('window_sz2, lookahead_sz2', [(11, 4), (12, 4)])
+def test_heatshrink_random_streams(window_sz2, lookahead_sz2):
+    # every bitstream decodes to something; the vectorised token walk must agree with the sequential one
+    rng = np.random.default_rng(0)
+    for n in (1, 2, 3, 17, 200, 2000):
+        data = rng.integers(0, 256, n, dtype=np.uint8).tobytes()
+        size = len(heatshrink_reference(data, window_sz2, lookahead_sz2, 1 << 30))
+        assert heatshrink_decode(data, window_sz2, lookahead_sz2, size) == heatshrink_reference(data, window_sz2, lookahead_sz2, size)
+    for data in (b'\xff' * 500, b'\x00' * 500):
+        size = len(heatshrink_reference(data, window_sz2, lookahead_sz2, 1 << 30))
+        assert heatshrink_decode(data, window_sz2, lookahead_sz2, size) == heatshrink_reference(data, window_sz2, lookahead_sz2, size)
+
+def test_heatshrink_round_trip():
+    text = sample_gcode(layers=1, moves=40).encode()
+    assert heatshrink_decode(heatshrink_encode(text, 11, 4), 11, 4, len(text)) == text
+
+def test_meatpack_packed_lines():
+    # two characters per byte, low nibble first; 'Y' is not in the table and follows the pair as a full byte
+    data = bytes([0xFF, 0xFF, 251, 0x1D, 0xEB, 0xA1, 0xB5, 0x2F, ord('Y'), 0xC0])
+    assert meatpack_decode(data) == b'G1 X1.5 Y20\n'
+
+def test_bgcode_matches_ascii(tmp_path):
+    text = sample_gcode(layers=3, moves=30).encode()
+    (tmp_path / 'sample.gcode').write_bytes(text)
+    write_bgcode(tmp_path / 'sample.bgcode', text)
+    assert_same(parse_gcode(tmp_path / 'sample.bgcode'), parse_gcode(tmp_path / 'sample.gcode'))
+
+    with BGCodeReader(tmp_path / 'sample.bgcode') as reader:
+        assert reader.read_metadata()[BlockType.SLICER_METADATA] == {'layer_height': '0.2'}
+
+def test_source_lines_match_ascii(tmp_path):
+    text = sample_gcode(layers=3, moves=30).encode()
+    (tmp_path / 'sample.gcode').write_bytes(text)
+    write_bgcode(tmp_path / 'sample.bgcode', text, block_size=512)
+    mesh = parse_gcode(tmp_path / 'sample.gcode')
+    # out of order, so later lookups reuse and extend the block table
+    for seg in (mesh.seg_count - 1, 0, mesh.seg_count // 2, 1):
+        offset, line = int(mesh.offset[seg]), int(mesh.line[seg])
+        expected = read_source_lines(tmp_path / 'sample.gcode', offset, line, 2, 2)
+        assert read_source_lines(tmp_path / 'sample.bgcode', offset, line, 2, 2) == expected
+
+def test_checksum_mismatch(tmp_path):
+    path = tmp_path / 'sample.bgcode'
+    write_bgcode(path, sample_gcode(layers=1, moves=30).encode())
+    data = bytearray(path.read_bytes())
+    data[-10] ^= 0x01 # inside the last G-code block
+    path.write_bytes(bytes(data))
+    with pytest.raises(BGCodeException, match='checksum'):
+        parse_gcode(path)
+
+def test_damaged_metadata_gives_empty_stats(tmp_path):
+    path = tmp_path / 'sample.bgcode'
+    write_bgcode(path, sample_gcode(layers=1, moves=30).encode())
+    data = bytearray(path.read_bytes())
+    data[30] ^= 0x01 # inside the file metadata block
+    path.write_bytes(bytes(data))
+    assert read_gcode_metadata(path) == {}
+    path.write_bytes(b'GCDE\x01\x00\x00\x00\x07\x00') # unknown checksum type
+    assert read_gcode_metadata(path) == {}
@@ -0,0 +1,37 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from infra.gcode import parse_gcode
+from infra.gcode_cache import SegmentCacheException, load_segments, parse_gcode_cached, save_segments, sidecar_path
+from gcode_samples import assert_same
+
+def test_round_trip(gcode_file):
+    mesh = parse_gcode(gcode_file)
+    save_segments(gcode_file, mesh)
+    assert_same(load_segments(gcode_file), mesh)
+
+def test_stale_sidecar_is_ignored(gcode_file):
+    save_segments(gcode_file, parse_gcode(gcode_file))
+    st = os.stat(gcode_file)
+    os.utime(gcode_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert load_segments(gcode_file) is None
+
+def test_concurrent_writers(gcode_file):
+    # the preview worker and the importer may write the same sidecar at once
+    mesh = parse_gcode(gcode_file)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: save_segments(gcode_file, mesh), range(32)))
+    assert_same(load_segments(gcode_file), mesh)
+    assert sorted(os.listdir(gcode_file.parent)) == ['sample.gcode', 'sample.gcode.segments']
+
+def test_write_failure_is_reported(gcode_file):
+    os.mkdir(sidecar_path(gcode_file)) # the sidecar cannot replace a directory
+    with pytest.raises(SegmentCacheException):
+        parse_gcode_cached(gcode_file)
+
+    errors = []
+    mesh = parse_gcode_cached(gcode_file, on_cache_error=errors.append)
+    assert mesh.seg_count and len(errors) == 1
+    assert sorted(os.listdir(gcode_file.parent)) == ['sample.gcode', 'sample.gcode.segments']
@@ -0,0 +1,22 @@
+import numpy as np
+
+from infra.gcode import parse_gcode
+
+def test_extruding_segments(tmp_path):
+    path = tmp_path / 'import.gcode'
+    path.write_text(
+        ';TYPE:External perimeter\n'
+        'G1 X1 Y1 E.5\n'     # 0: first move, start position only
+        'G1 X2 Y1 E.5\n'     # 1: edge
+        'G0 X5 Y5\n'         # 2: travel, still moves the start of the next edge
+        'G1 E.8\n'           # 3: unretract, no motion
+        'G1 X5 Y5 E.1\n'     # 4: extrudes in place, no edge
+        'G1 X6 Y5 E.5\n'     # 5: edge from (5, 5)
+        ';TYPE:Perimeter\n'
+        'G1 X7 Y5 E.5\n')    # 6: edge of another feature
+    mesh = parse_gcode(path)
+    np.testing.assert_array_equal(mesh.extruding_segments(), [1, 5, 6])
+    seg = mesh.extruding_segments(['External perimeter'])
+    np.testing.assert_array_equal(seg, [1, 5])
+    np.testing.assert_array_equal(mesh.pos[mesh.pt_id_of_seg[seg]][:, :, :2], [[[1, 1], [2, 1]], [[5, 5], [6, 5]]])
+    np.testing.assert_array_equal(mesh.line[seg], [2, 6])
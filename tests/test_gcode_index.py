@@ -0,0 +1,41 @@
+import numpy as np
+
+from infra import gcode_index as gi
+from infra.gcode import parse_gcode
+from infra.gcode_source import read_source_lines
+from infra.gcode_tokenizer import INDEXED_OPCODES
+from gcode_samples import sample_gcode
+
+def test_index_matches_lines(tmp_path):
+    path = tmp_path / 'sample.gcode'
+    path.write_text(sample_gcode(layers=3) + 'G1 X1 Y1') # no trailing newline
+    data = path.read_bytes()
+    lines = data.split(b'\n')
+    index = gi.gcode_index(path)
+    assert index.line_count == len(lines)
+    np.testing.assert_array_equal(index.line_starts, np.cumsum([0] + [len(l) + 1 for l in lines[:-1]] + [len(lines[-1])]))
+    for op in INDEXED_OPCODES:
+        expected = [i for i, l in enumerate(lines) if l.lstrip(b' \t').split(b' ')[0].split(b';')[0] == op]
+        np.testing.assert_array_equal(index.opcodes[op], expected, err_msg=op.decode())
+
+def test_index_is_shared_and_bounded(tmp_path):
+    a, b = tmp_path / 'a.gcode', tmp_path / 'b.gcode'
+    a.write_text(sample_gcode(layers=2))
+    b.write_text(sample_gcode(layers=1))
+    parse_gcode(a)
+    index = gi._index
+    assert index.path == str(a)
+    assert gi.gcode_index(a) is index # reused by lookups after parsing
+    gi.gcode_index(b)
+    assert gi._index.path == str(b) # only the latest file is kept
+
+def test_source_lines_from_index(tmp_path):
+    path = tmp_path / 'crlf.gcode'
+    text = sample_gcode(layers=2)
+    path.write_bytes(text.replace('\n', '\r\n').encode())
+    lines = text.split('\n')
+    mesh = parse_gcode(path)
+    for seg in (0, 1, mesh.seg_count // 2, mesh.seg_count - 1):
+        line = int(mesh.line[seg])
+        expected = [(i, lines[i]) for i in range(max(line - 2, 0), line + 3)]
+        assert read_source_lines(path, int(mesh.offset[seg]), line, 2, 2) == expected
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from infra.gcode import parse_gcode
+from infra.gcode_layers import LayerTable
+
+def table(z):
+    z = np.asarray(z, dtype=np.float32)
+    first = np.arange(len(z), dtype=np.int64) * 10
+    return LayerTable(z, first, first + 9, np.full(len(z), 0.2, dtype=np.float32))
+
+def test_z_hop_and_travel_above_layer(tmp_path):
+    # lifts and travels above the print are not layers, with or without ;Z: markers
+    moves = 'G1 X1 Y1 E1\nG1 Z{hop}\nG0 X5 Y5 Z{travel}\nG1 Z{z}\nG1 X2 Y2 E1\n'
+    body = ''.join(moves.format(z=z, hop=z + 0.4, travel=z + 2) for z in (0.2, 0.4, 0.6))
+    marked = ''.join(f';Z:{z}\nG1 Z{z}\n' + moves.format(z=z, hop=z + 0.4, travel=z + 2) for z in (0.2, 0.4, 0.6))
+    for name, text in (('plain', 'G1 Z0.2\n' + body), ('marked', marked)):
+        path = tmp_path / f'{name}.gcode'
+        path.write_text(text)
+        layers = parse_gcode(path).layers()
+        np.testing.assert_allclose(layers.z, [0.2, 0.4, 0.6], rtol=1e-6, err_msg=name)
+        assert layers.first[0] == 0
+        np.testing.assert_array_equal(layers.first[1:], layers.last[:-1] + 1)
+
+def test_sequential_print_range_is_conservative():
+    # two objects printed one after the other: z goes back down
+    layers = table([0.2, 0.4, 0.6, 0.2, 0.4, 0.6])
+    for zmin, zmax in ((0.3, 0.5), (0.1, 0.3), (0.5, 1.0), (0.0, 1.0)):
+        lo, hi = layers.layer_range(zmin, zmax)
+        inside = np.flatnonzero((layers.z > zmin) & (layers.z < zmax))
+        assert lo <= inside[0] and inside[-1] < hi, (zmin, zmax)
+    assert layers.layer_range(0.7, 1.0) == (6, 6)
+
+def test_empty_table(tmp_path):
+    path = tmp_path / 'empty.gcode'
+    path.write_text('; no moves\nM104 S215\n')
+    layers = parse_gcode(path).layers()
+    assert len(layers) == 0
+    assert layers.layer_range(-1.0, 1.0) == (0, 0)
+    assert layers.snap(0.3) == 0.3
+
+def test_snap_boundaries():
+    layers = table([0.2, 0.4, 0.6])
+    np.testing.assert_allclose(layers.bounds, [0.1, 0.3, 0.5, 0.7], rtol=1e-6)
+    assert layers.snap(0.25) == pytest.approx(0.3)
+    assert layers.snap(0.35) == pytest.approx(0.3)
+    assert layers.snap(np.float32(0.2)) == pytest.approx(0.1) # tie goes down
+    assert layers.snap(-5.0) == pytest.approx(0.1)
+    assert layers.snap(5.0) == pytest.approx(0.7)
+    # a snapped bound keeps or drops whole layers
+    assert layers.layer_range(layers.snap(0.26), layers.snap(0.64)) == (1, 3)
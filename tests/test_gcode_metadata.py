@@ -0,0 +1,30 @@
+from infra.gcode import FOOTER_GAP_LINES, read_gcode_metadata
+from gcode_samples import sample_gcode
+
+def test_footer_skips_stray_gcode(tmp_path):
+    path = tmp_path / 'sample.gcode'
+    path.write_text(sample_gcode(layers=2) +
+        '; filament used [g] = 3.70\n'
+        '; estimated printing time (normal mode) = 1h 2m\n'
+        'M84 ; appended by a post-processing script\n'
+        '\n'
+        '; prusaslicer_config = begin\n'
+        '; layer_height = 0.2\n'
+        '; prusaslicer_config = end\n'
+        'M107\n')
+    values = read_gcode_metadata(path, block_size=64)
+    assert values['filament used [g]'] == '3.70'
+    assert values['layer_height'] == '0.2'
+
+def test_footer_stops_in_gcode_body(tmp_path):
+    path = tmp_path / 'sample.gcode'
+    path.write_text('; layer_height = 0.3\n' + 'G1 X1 Y1 E0.1\n' * FOOTER_GAP_LINES + '; layer_height = 0.2\n')
+    assert read_gcode_metadata(path, block_size=64) == {'layer_height': '0.2'}
+
+def test_only_latest_file_is_cached(tmp_path):
+    import infra.gcode as gcode
+    for name in ('a', 'b'):
+        path = tmp_path / f'{name}.gcode'
+        path.write_text(f'G1 X1\n; name = {name}\n')
+        assert read_gcode_metadata(path) == {'name': name}
+    assert gcode._metadata_cache[0] == str(tmp_path / 'b.gcode')
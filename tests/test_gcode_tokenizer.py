@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from infra.gcode import parse_gcode, parse_gcode_regex
+from gcode_samples import assert_same
+
+# what the regex parser fills in; line offsets also differ between CRLF and LF files
+FIELDS = ('pos', 'extrusion', 'width', 'height', 'fan_speed', 'temperature', 'feature_type')
+
+@pytest.mark.parametrize('chunk_size', [0, 4096, 1024, 777])
+def test_matches_regex_parser(gcode_file, chunk_size):
+    # small chunks put block edges inside layers, features and modal runs
+    assert_same(parse_gcode(gcode_file, chunk_size), parse_gcode_regex(gcode_file), FIELDS)
+
+def test_line_numbers_and_offsets(gcode_file):
+    data = gcode_file.read_bytes()
+    starts = np.concatenate(([0], np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 0x0A) + 1))
+    moves = [i for i, line in enumerate(data.split(b'\n')) if line.lstrip(b' \t')[:3] in (b'G0 ', b'G1 ')]
+
+    mesh = parse_gcode(gcode_file, 1024)
+    np.testing.assert_array_equal(mesh.line[:mesh.seg_count], moves)
+    np.testing.assert_array_equal(mesh.offset[:mesh.seg_count], starts[moves])
+
+def test_leading_blanks(tmp_path):
+    path = tmp_path / 'indented.gcode'
+    path.write_text(';TYPE:Perimeter\n;WIDTH:0.45\n  G1 X1 Y2 E.5\n\tG1 X3 Y4 E.5\n \t;TYPE:Gap fill\n  M106 S128\nG1 X5 Y6 E.5\n')
+    mesh = parse_gcode(path)
+    assert mesh.seg_count == 3
+    np.testing.assert_array_equal(mesh.pos[:, :2], [[1, 2], [3, 4], [5, 6]])
+    np.testing.assert_array_equal(mesh.feature_type, [0, 0, 11])
+    np.testing.assert_array_equal(mesh.fan_speed, [0, 0, 128])
+    assert_same(mesh, parse_gcode_regex(path), FIELDS)
+
+def test_g0_moves_without_extruding(tmp_path):
+    path = tmp_path / 'g0.gcode'
+    path.write_text('G1 X1 Y1 E.5\nG0 X5 Y5 E2\nG1 X6 Y5 E.5\n')
+    mesh = parse_gcode(path)
+    np.testing.assert_array_equal(mesh.pos[:, :2], [[1, 1], [5, 5], [6, 5]])
+    np.testing.assert_array_equal(mesh.extrusion, [.5, 0, .5])
+    assert_same(mesh, parse_gcode_regex(path), FIELDS)
+
+def test_crlf_matches_lf(tmp_path, gcode_file):
+    crlf = tmp_path / 'crlf.gcode'
+    crlf.write_bytes(gcode_file.read_bytes().replace(b'\n', b'\r\n'))
+    assert_same(parse_gcode(crlf, 1024), parse_gcode(gcode_file), FIELDS)
+
+def test_layers(gcode_file):
+    layers = parse_gcode(gcode_file, 1024).layers()
+    assert len(layers) == 12
+    np.testing.assert_allclose(layers.z, np.arange(1, 13) * 0.2, rtol=1e-6)
+    assert layers.first[0] == 0
+    np.testing.assert_array_equal(layers.first[1:], layers.last[:-1] + 1)
@@ -0,0 +1,42 @@
+import numpy as np
+
+from core.geometry import _MIX, merge_exact_duplicates
+
+def test_face_remapping():
+    co = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 0, 0], [0, 0, 0], [1, 1, 0]], dtype=np.float32)
+    faces = np.array([[0, 1, 2], [3, 4, 5]], dtype=np.int32)
+    merged, remapped = merge_exact_duplicates(co, faces)
+    np.testing.assert_array_equal(merged, co[[0, 1, 2, 5]])
+    np.testing.assert_array_equal(remapped, [[0, 1, 2], [1, 0, 3]])
+    np.testing.assert_array_equal(merged[remapped], co[faces])
+
+def test_nothing_to_merge_returns_input():
+    co = np.random.default_rng(0).random((50, 3), dtype=np.float32)
+    faces = np.arange(48, dtype=np.int32).reshape(-1, 3)
+    merged, remapped = merge_exact_duplicates(co, faces)
+    assert merged is co and remapped is faces
+
+def test_signed_zero_is_not_merged():
+    co = np.array([[0.0, 1, 2], [-0.0, 1, 2], [0.0, 1, 2]], dtype=np.float32)
+    faces = np.array([[0, 1, 2]], dtype=np.int32)
+    merged, remapped = merge_exact_duplicates(co, faces)
+    assert len(merged) == 2
+    np.testing.assert_array_equal(remapped, [[0, 1, 0]])
+    assert np.signbit(merged[1, 0])
+
+def test_key_collision_falls_back_to_exact_rows():
+    # two different vertices with the same packed key, plus a real duplicate of the first
+    z = 0x3F800000 # bits of 1.0
+    packed = 0x3F000000_3F000000 ^ (z * int(_MIX)) % (1 << 64) # x, y of the second vertex, so that its key matches the first one's
+    bits = np.array([
+        [0x3F000000, 0x3F000000, 0],
+        [packed >> 32, packed & 0xFFFFFFFF, z],
+        [0x3F000000, 0x3F000000, 0],
+    ], dtype=np.uint32)
+    co = bits.view(np.float32)
+    key = (bits[:, 0].astype(np.uint64) << np.uint64(32) | bits[:, 1]) ^ (bits[:, 2].astype(np.uint64) * _MIX)
+    assert key[0] == key[1]
+
+    merged, remapped = merge_exact_duplicates(co, np.array([[0, 1, 2]], dtype=np.int32))
+    np.testing.assert_array_equal(merged.view(np.uint32), bits[:2])
+    np.testing.assert_array_equal(remapped, [[0, 1, 0]])
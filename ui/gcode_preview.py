@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Empty, SimpleQueue
+import threading
 from typing import TYPE_CHECKING, Any
 
 import bpy
@@ -9,9 +13,13 @@ import blf
 from gpu_extras.batch import batch_for_shader
 
 from ..infra.gcode import labels
+from ..infra.blender_bridge import redraw
+from ..infra.gcode_chunks import ChunkTable
 from .. import TYPES_NAME
+from .gcode_shader import BOX_TRIS, FAR, VIEW_IDS, InstancedSegments, create_instanced
 
 if TYPE_CHECKING:
+    from ..infra.gcode_layers import LayerTable
     from gpu.types import GPUShader, GPUBatch
     from bpy.types import Object
     from numpy.typing import NDArray
@@ -72,6 +80,18 @@ range_colors = np.vstack(
     )
 ).astype(np.float32, copy=False)
 
+# row 0: feature colors, row 1: range colors, sampled by the instanced shader
+colormap_rows = np.zeros((2, max(len(color_map), len(range_colors)), 4), dtype=np.float32)
+colormap_rows[0, :len(color_map)] = color_map
+colormap_rows[1, :len(range_colors)] = range_colors
+
+NUMERIC_VIEWS = ("height", "width", "temperature", "fan_speed")
+
+COLOR_CACHE_VIEWS = 2 # expanded vertex color arrays kept by SegmentTrisCache
+
+FIRST_PASS_SEGMENTS = 500_000   # lowest layers uploaded before the whole print
+PREPARE_POLL_INTERVAL = 0.1     # seconds between checks on the background preparation
+
 legend_title_mapping = {
     "feature_type": "Feature Type",
     "height": "Height (mm)",
@@ -111,12 +131,19 @@ class SegmentTrisCache:
     _transform: NDArray[np.float32]
     _scale: float
 
+    # expanded geometry, only built when the instanced shader is unavailable
+    _expanded: bool
     _tris_points: NDArray[np.float32]        # (S*8, 3)
     _tris_by_seg: NDArray[np.int32]          # (S, 8, 3)
-    _brightness: NDArray[np.float32]         # (S*8, 4)
+    _brightness: NDArray[np.float32]         # (8, 4)
+    _colors_by_view: OrderedDict[str, NDArray[np.float32]]  # view -> (S*8,4), least recently used first
 
-    _colors_by_view: dict[str, NDArray[np.float32]]  # view -> (S*8,4)
-    _legend_by_view: dict[str, dict]                   # view -> legend dict
+    _seg_ends: NDArray[np.float32] | None    # (S, 2, 3) segment start/end, scaled, for line batches
+    _ranges: dict[str, tuple[float, float]]  # view -> (min, max)
+
+    layers: LayerTable
+    chunks: ChunkTable
+    chunk_corners: NDArray[np.float32]       # (C, 8, 4) chunk bounding boxes in scene space
 
     _extrusion_mask: NDArray[np.bool]       # (S,)
     _feature_masks: list[NDArray[np.bool]]  # per feature type index, (S,)
@@ -130,6 +157,7 @@ class SegmentTrisCache:
         self._transform = transform.astype(np.float32, copy=False)
         self._scale = float(scale)
 
+        self.cache_error: str | None = None
         self._parse_gcode()
         self.S = int(self._mesh_data.seg_count)
 
@@ -137,61 +165,224 @@ class SegmentTrisCache:
         self._ft = self._mesh_data.feature_type.astype(np.int32)
         self._extrusion_mask = (self._mesh_data.extrusion > 0)
 
-        # z array (point-based in your existing logic)
+        # z of every point; segment i ends at point i, so this is also the z of each segment
         self._z = self._mesh_data.pos[:, 2].astype(np.float32, copy=False)
 
         # precompute feature masks (size based on max ft present)
         max_ft = int(np.max(self._ft)) if self.S else 0
         self._feature_masks = [(self._ft == i) for i in range(max_ft + 1)]
 
-        # geometry once
+        self.layers = self._mesh_data.layers()
+        self.chunks = ChunkTable.from_segments(self._mesh_data, self.layers)
+        self.chunk_corners = self.chunks.box_corners(self._transform, self._scale)
+
+        # running z bounds of the extruded segments, for binary-searched draw ranges
+        self._z_prefix_max = np.maximum.accumulate(np.where(self._extrusion_mask, self._z, -np.inf))
+        self._z_suffix_min = np.minimum.accumulate(np.where(self._extrusion_mask, self._z, np.inf)[::-1])[::-1]
+        self._layer_counts_key: int | None = None
+        self._layer_counts: tuple[NDArray[np.float32], NDArray[np.int64]] = (np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64))
+
+        self._expanded = False
+        self._seg_ends = None
+        self._ranges = {}
+        self._colors_by_view = OrderedDict()
+
+    def _expand(self) -> None:
+        # 8 vertices per segment, for the batch_for_shader path
+        if self._expanded:
+            return
+
         self._tris_points = self.__tris_points
 
-        # per-segment triangle indices once
-        base_tris: NDArray[np.int32] = np.array(
-            [
-                [0, 4, 1],
-                [1, 4, 5],
-                [1, 5, 2],
-                [3, 7, 0],
-                [2, 5, 6],
-                [2, 6, 3],
-                [3, 6, 7],
-                [7, 4, 0],
-            ],
-            dtype=np.int32,
-        )  # (8,3)
+        # per-segment triangle indices
         seg_offsets: NDArray[np.int32] = (np.arange(self.S, dtype=np.int32) * 8)[:, None, None]  # (S,1,1)
-        self._tris_by_seg = base_tris[None, :, :] + seg_offsets  # (S,8,3)
+        self._tris_by_seg = BOX_TRIS[None, :, :] + seg_offsets  # (S,8,3)
 
-        # brightness mask once (S*8,4)
+        # brightness pattern of the 8 box vertices
         self._brightness = self.__color_brightness_mask.astype(np.float32, copy=False)
 
-        # colors & legends for all views once
-        self._precompute_colors()
+        self._expanded = True
 
     def _parse_gcode(self) -> None:
-        from ..infra.gcode import parse_gcode
-        self._mesh_data = parse_gcode(self.path)
+        from ..infra.gcode_cache import SegmentCacheException, parse_gcode_cached
+        def cache_failed(e: SegmentCacheException) -> None:
+            self.cache_error = str(e)
+        self._mesh_data = parse_gcode_cached(self.path, on_cache_error=cache_failed)
 
     # -----------------------------
     # Public data used by renderer
     # -----------------------------
 
-    @property
-    def points_pos(self) -> NDArray[np.float32]:
-        return self._tris_points
-
     def colors_for_view(self, view: str) -> NDArray[np.float32]:
-        return self._colors_by_view.get(view, self._brightness)
+        # (S*8,4) vertex colors, built on first use and kept for the last few views
+        self._expand()
+        colors = self._colors_by_view.get(view)
+        if colors is None:
+            colors = self._expand_seg_rgba_to_verts(self.seg_colors_for_view(view))
+            self._colors_by_view[view] = colors
+            while len(self._colors_by_view) > COLOR_CACHE_VIEWS:
+                self._colors_by_view.popitem(last=False)
+        self._colors_by_view.move_to_end(view)
+        return colors
 
     def legend_for_view(self, view: str) -> dict:
-        return self._legend_by_view.get(view, {})
-
-    def tris_idx_for_seg_mask(self, seg_mask: "NDArray[np.bool_]") -> NDArray[np.int32]:
         if self.S == 0:
-            return np.zeros((0, 3), dtype=np.int32)
-        return self._tris_by_seg[seg_mask].reshape(-1, 3).astype(np.int32, copy=False)
+            return {}
+        if view == "feature_type":
+            # Keep your previous legend mapping semantics (reverse labels/colors)
+            return {l: color_map[::-1][i] for i, l in enumerate(labels[::-1])}
+        if view in NUMERIC_VIEWS:
+            return self.generate_legend(range_colors, *self.view_range(view))
+        return {}
+
+    def view_range(self, view: str) -> tuple[float, float]:
+        # (min, max) of a numeric view, gap fill excluded
+        if view not in self._ranges:
+            if self.S == 0:
+                self._ranges[view] = (0.0, 0.0)
+                return self._ranges[view]
+
+            attr = getattr(self._mesh_data, view)
+            valid = (self._ft != 12)
+            max_attr = float(np.max(attr[valid])) if np.any(valid) else float(np.max(attr))
+            if view == "fan_speed":
+                min_attr = 0.0
+            else:
+                min_attr = float(np.min(attr[valid])) if np.any(valid) else float(np.min(attr))
+            self._ranges[view] = (min_attr, max_attr)
+        return self._ranges[view]
+
+    def seg_colors_for_view(self, view: str) -> NDArray[np.float32]:
+        # (S,4) color of every segment, without brightness
+        if view == "feature_type":
+            return color_map[self._ft].astype(np.float32, copy=False)
+        if view not in NUMERIC_VIEWS:
+            return np.ones((self.S, 4), dtype=np.float32)
+
+        return range_lut[self.scalar_for_view(view)]
+
+    def scalar_for_view(self, view: str) -> NDArray[np.uint8]:
+        # (S,) attribute of a numeric view normalized to an index into range_lut
+        attr = getattr(self._mesh_data, view)
+        min_attr, max_attr = self.view_range(view)
+        rng = max_attr - min_attr
+        if rng == 0.0:
+            return np.zeros(len(attr), dtype=np.uint8)
+        mapped = np.clip((attr - min_attr) / rng, 0.0, 1.0)
+        return np.rint(mapped * (len(range_lut) - 1)).astype(np.uint8)
+
+    def point_records(self) -> NDArray[np.float32]:
+        # (S, 2, 4) per point: (x, y, z, feature), (width, height, fan, temperature); the feature is -1 - ft for travel moves
+        md = self._mesh_data
+        S = self.S
+        rec = np.empty((S, 2, 4), dtype=np.float32)
+        rec[:, 0, :3] = md.pos[:S]
+        ft = self._ft.astype(np.float32)
+        rec[:, 0, 3] = np.where(self._extrusion_mask, ft, -1.0 - ft)
+        rec[:, 1, 0] = md.width[:S]
+        rec[:, 1, 1] = md.height[:S]
+        rec[:, 1, 2] = md.fan_speed[:S]
+        rec[:, 1, 3] = md.temperature[:S]
+        return rec
+
+    def feature_bits_from_settings(self, settings: dict[str, Any]) -> int:
+        bits = 0
+        for prop, ft_idx in PROP_TO_FT_IDX.items():
+            if settings.get(prop, False):
+                bits |= 1 << ft_idx
+        return bits
+
+    def source_lines(self, seg: int, before: int = 0, after: int = 0) -> list[tuple[int, str]]:
+        # G-code lines around segment seg, read straight from its recorded offset
+        from ..infra.gcode_source import read_source_lines
+        md = self._mesh_data
+        return read_source_lines(self.path, int(md.offset[seg]), int(md.line[seg]), before, after)
+
+    def chunk_tris(self, start: int, end: int, chunk_mask: "NDArray[np.bool_]", view: str) -> tuple[NDArray[np.float32], NDArray[np.float32], NDArray[np.int32]]:
+        # (pos, color, tris_idx) of the segments [start, end) selected by chunk_mask, indexed from the chunk's first vertex
+        self._expand()
+        pos = self._tris_points[start * 8:end * 8]
+        color = self.colors_for_view(view)[start * 8:end * 8]
+        tris_idx = (self._tris_by_seg[start:end][chunk_mask] - start * 8).reshape(-1, 3).astype(np.int32, copy=False)
+        return pos, color, tris_idx
+
+    # -----------------------------
+    # Level of detail
+    # -----------------------------
+
+    @staticmethod
+    def _budget_split(layers: NDArray[np.float32], counts: NDArray[np.int64], budget: int) -> float:
+        # lowest z from which whole layers still fit in budget triangles as boxes
+        if int(counts.sum()) * 8 <= budget:
+            return -np.inf
+        n_near = int(np.count_nonzero(np.cumsum(counts[::-1]) * 8 <= budget))
+        return float(layers[len(layers) - n_near]) if n_near else np.inf
+
+    def lod_split_z(self, seg_mask: "NDArray[np.bool_]", budget: int) -> float:
+        return self._budget_split(*np.unique(self._z[seg_mask], return_counts=True), budget)
+
+    def lod_split_z_range(self, feature_bits: int, zmin: float, zmax: float, budget: int) -> float:
+        # same as lod_split_z for the visible features within (zmin, zmax), from per-layer counts
+        if self._layer_counts_key != feature_bits:
+            shown = ((feature_bits >> self._ft) & 1).astype(bool) & self._extrusion_mask
+            self._layer_counts = np.unique(self._z[shown], return_counts=True)
+            self._layer_counts_key = feature_bits
+
+        layers, counts = self._layer_counts
+        lo = int(np.searchsorted(layers, zmin, side="right"))
+        hi = int(np.searchsorted(layers, zmax, side="left"))
+        return self._budget_split(layers[lo:hi], counts[lo:hi], budget)
+
+    def low_layers_end(self, max_segments: int) -> int:
+        # end of the lowest whole layers holding at most max_segments segments
+        if self.S <= max_segments:
+            return self.S
+        ends = self.layers.last + 1
+        n = int(np.searchsorted(ends, max_segments, side="right"))
+        return int(ends[n - 1]) if n else max_segments
+
+    def draw_range(self, zmin: float, zmax: float) -> tuple[int, int]:
+        # [start, end) of the segments that may be visible within (zmin, zmax); exact filtering is left to the shader
+        start = int(np.searchsorted(self._z_prefix_max, zmin, side="right"))
+        end = int(np.searchsorted(self._z_suffix_min, zmax, side="left"))
+        return start, max(start, end)
+
+    def lod_split(self, seg_mask: "NDArray[np.bool_]", budget: int) -> tuple["NDArray[np.bool_]", "NDArray[np.bool_]"]:
+        # (box mask, line mask): boxes at and above the split, lines below
+        boxes = seg_mask & (self._z >= self.lod_split_z(seg_mask, budget))
+        return boxes, seg_mask & ~boxes
+
+    @property
+    def seg_ends(self) -> NDArray[np.float32]:
+        if self._seg_ends is None:
+            md = self._mesh_data
+            ends = md.pos[md.pt_id_of_seg[:self.S]].astype(np.float32, copy=False) + self._transform
+            self._seg_ends = (ends * self._scale).astype(np.float32, copy=False)
+        return self._seg_ends
+
+    def _collinear_runs(self, idx: NDArray[np.int64]) -> tuple[NDArray[np.int64], NDArray[np.int64]]:
+        # first/last segment of each run of consecutive, same-feature, same-direction segments
+        a, b = idx[:-1], idx[1:]
+        ends = self.seg_ends
+        d = ends[:, 1] - ends[:, 0]
+        da, db = d[a], d[b]
+        dot = np.einsum("ij,ij->i", da, db)
+        norms = np.linalg.norm(da, axis=1) * np.linalg.norm(db, axis=1)
+        cont = (b == a + 1) & (self._ft[a] == self._ft[b]) & (dot > norms * (1 - 1e-6)) & (norms > 0)
+
+        first = np.concatenate(([True], ~cont))
+        last = np.concatenate((~cont, [True]))
+        return idx[first], idx[last]
+
+    def lines_for_seg_mask(self, seg_mask: "NDArray[np.bool_]", view: str, merge: bool = False) -> tuple[NDArray[np.float32], NDArray[np.float32]]:
+        # (pos, color) of a LINES batch, one line per segment or per collinear run
+        idx = np.flatnonzero(seg_mask)
+        if len(idx) == 0:
+            return np.zeros((0, 3), dtype=np.float32), np.zeros((0, 4), dtype=np.float32)
+
+        starts, ends = self._collinear_runs(idx) if merge else (idx, idx)
+        pos = np.stack((self.seg_ends[starts, 0], self.seg_ends[ends, 1]), axis=1).reshape(-1, 3)
+        return pos, np.repeat(self.seg_colors_for_view(view)[starts], 2, axis=0)
 
     # -----------------------------
     # Masks computed cheaply per update
@@ -212,10 +403,14 @@ class SegmentTrisCache:
         return mask
 
     def height_mask_from_settings(self, settings: dict[str, Any]) -> NDArray[np.bool]:
+        # only compares the segments in the binary-searched draw range; travel moves outside it are left out
         min_z: float = float(settings.get("gcode_preview_min_z", 0.))
         max_z: float = float(settings.get("gcode_preview_max_z", 1000.))
-        z = self._z
-        return (z > min_z) & (z < max_z)
+        start, end = self.draw_range(min_z, max_z)
+        mask = np.zeros((self.S,), dtype=bool)
+        z = self._z[start:end]
+        mask[start:end] = (z > min_z) & (z < max_z)
+        return mask
 
     # -----------------------------
     # Precomputed internals
@@ -223,12 +418,12 @@ class SegmentTrisCache:
 
     @property
     def __color_brightness_mask(self) -> NDArray[np.float32]:
-        # per-segment 8-vertex brightness pattern
+        # 8-vertex brightness pattern shared by every segment
         arr1: NDArray[np.float32] = np.array([1.00, 0.75, 0.50, 0.75, 1.00, 0.75, 0.50, 0.75], dtype=np.float32)
         rgba: NDArray[np.float32] = np.array([1, 1, 1, 0], dtype=np.float32)
         result: NDArray[np.float32] = arr1[:, None] * rgba
         result[:, 3] = 1.0
-        return np.tile(result, (int(self.S), 1))
+        return result
 
     @staticmethod
     def interp(attr: NDArray[np.float32], colors: NDArray[np.float32]) -> NDArray[np.float32]:
@@ -266,53 +461,9 @@ class SegmentTrisCache:
     def _expand_seg_rgba_to_verts(self, seg_rgba: NDArray[np.float32]) -> NDArray[np.float32]:
         # seg_rgba: (S,4) -> (S*8,4), multiplied by brightness
         out = np.empty((self.S * 8, 4), dtype=np.float32)
-        out.reshape(self.S, 8, 4)[:] = seg_rgba[:, None, :].astype(np.float32, copy=False)
-        np.multiply(out, self._brightness, out=out)
+        np.multiply(seg_rgba[:, None, :], self._brightness[None, :, :], out=out.reshape(self.S, 8, 4))
         return out
 
-    def _precompute_colors(self) -> None:
-        self._colors_by_view = {}
-        self._legend_by_view = {}
-
-        if self.S == 0:
-            self._colors_by_view["feature_type"] = np.zeros((0, 4), dtype=np.float32)
-            self._legend_by_view["feature_type"] = {}
-            for v in ("height", "width", "temperature", "fan_speed"):
-                self._colors_by_view[v] = np.zeros((0, 4), dtype=np.float32)
-                self._legend_by_view[v] = {}
-            return
-
-        ft = self._ft
-
-        # feature_type
-        seg_rgba = color_map[ft].astype(np.float32, copy=False)
-        self._colors_by_view["feature_type"] = self._expand_seg_rgba_to_verts(seg_rgba)
-        # Keep your previous legend mapping semantics (reverse labels/colors)
-        self._legend_by_view["feature_type"] = {
-            l: color_map[::-1][i] for i, l in enumerate(labels[::-1])
-        }
-
-        # numeric views
-        valid = (ft != 12)  # exclude gap fill from min/max
-        for view in ("height", "width", "temperature", "fan_speed"):
-            attr = getattr(self._mesh_data, view)
-
-            max_attr = float(np.max(attr[valid])) if np.any(valid) else float(np.max(attr))
-            if view == "fan_speed":
-                min_attr = 0.0
-            else:
-                min_attr = float(np.min(attr[valid])) if np.any(valid) else float(np.min(attr))
-
-            rng = max_attr - min_attr
-            if rng == 0.0:
-                mapped = np.zeros_like(attr, dtype=np.float32)
-            else:
-                mapped = ((attr - min_attr) / rng).astype(np.float32, copy=False)
-
-            seg_rgba = self.interp(mapped, range_colors).astype(np.float32, copy=False)
-            self._colors_by_view[view] = self._expand_seg_rgba_to_verts(seg_rgba)
-            self._legend_by_view[view] = self.generate_legend(range_colors, min_attr, max_attr)
-
     @property
     def __tris_points(self) -> NDArray[np.float32]:
         # Compute the segment vectors and directions
@@ -349,10 +500,13 @@ class SegmentTrisCache:
         points = np.concatenate((p1_block, p2_block), axis=1).reshape(-1, 3)
         return points.astype(np.float32, copy=False)
 
+# 256-step lookup of the range colors, indexed by SegmentTrisCache.scalar_for_view
+range_lut: NDArray[np.float32] = SegmentTrisCache.interp(np.linspace(0.0, 1.0, 256, dtype=np.float32), range_colors)
+
 class GcodeDraw:
     if not bpy.app.background: shader: GPUShader = gpu.shader.from_builtin("SMOOTH_COLOR")
 
-    # batches: [gcode_batch, plate_batch]
+    # batches: [lines_batch, plate_batch], the boxes are drawn per chunk
     batch: list[GPUBatch | None] = []
     enabled: bool = False
 
@@ -362,12 +516,33 @@ class GcodeDraw:
     _legend_draw_handler = None
 
     gcode: SegmentTrisCache | None = None
+    instanced: InstancedSegments | None = None
     _preview_data: dict | None = None
 
+    # background preparation: a worker parses and builds the buffers, a timer uploads them
+    _executor: ThreadPoolExecutor | None = None     # created on the first preview, shut down on unregister
+    _job: Future | None = None
+    _cancel: threading.Event | None = None
+    _job_progress: SimpleQueue | None = None        # (progress, text) posted by the worker, drained by the timer
+    _records: NDArray[np.float32] | None = None    # full point records waiting for upload
+    progress: float = 0.0
+    progress_text: str = ""
+    warning: str = ""   # shown in the preview panel, e.g. a segment cache that could not be written
+    source: list[tuple[int, str]] = []  # G-code lines around the inspected move, read when the slider changes
+
     # cached state to avoid rebuilding when unchanged
     _last_key: tuple | None = None
     _last_view: str | None = None
-    _last_seg_mask: NDArray[np.bool] | None = None
+    _legend: dict = {}
+
+    # per chunk batches of the expanded path, rebuilt only when their box mask or the view changes
+    _chunk_batches: list[GPUBatch | None] = []
+    _chunk_masks: list[NDArray[np.bool] | None] = []
+    _chunk_view: str | None = None
+
+    # frustum test of the last drawn view matrix
+    _visible_key: bytes | None = None
+    _visible: NDArray[np.bool] | None = None
 
     # cached plate batch and its key
     _plate_batch: GPUBatch | None = None
@@ -386,6 +561,18 @@ class GcodeDraw:
             indices=tris_idx,
         )
 
+    def _lines_batch(self, shader: GPUShader, pos: NDArray[np.float32], color: NDArray[np.float32]) -> GPUBatch | None:
+        if len(pos) == 0:
+            return None
+        return batch_for_shader(
+            shader,
+            type="LINES",
+            content={
+                "pos": pos,
+                "color": color,
+            }, #type: ignore
+        )
+
     def _preview_plate_data(self, scale: float = 0.001) -> dict[str, Any]:
         pd = self._preview_data
         assert pd
@@ -454,11 +641,52 @@ class GcodeDraw:
         for b in self.batch:
             if b:
                 b.draw(self.shader)
+        if self.gcode and (self.instanced or self._chunk_batches):
+            visible = self._visible_chunks()
+            if self.instanced:
+                self.instanced.draw(self.gcode.chunks.runs(visible, self.instanced.start, self.instanced.end))
+            for b, v in zip(self._chunk_batches, visible.tolist()):
+                if b and v:
+                    b.draw(self.shader)
 
         gpu.state.face_culling_set("NONE")
         gpu.state.depth_test_set("NONE")
         gpu.state.front_facing_set(False)
 
+    def _visible_chunks(self) -> NDArray[np.bool]:
+        # chunks inside the view frustum, recomputed only when the view matrix changes
+        assert self.gcode
+        mvp = np.array(gpu.matrix.get_projection_matrix() @ gpu.matrix.get_model_view_matrix(), dtype=np.float32)
+        key = mvp.tobytes()
+        if self._visible is None or self._visible_key != key:
+            self._visible = ChunkTable.visible(self.gcode.chunk_corners, mvp)
+            self._visible_key = key
+        return self._visible
+
+    def _update_chunk_batches(self, box_mask: NDArray[np.bool], view: str) -> None:
+        # only chunks whose boxes changed are uploaded again, e.g. the ones holding a toggled feature
+        assert self.gcode
+        chunks = self.gcode.chunks
+        if self._chunk_view != view or len(self._chunk_batches) != len(chunks):
+            self._chunk_batches = [None] * len(chunks)
+            self._chunk_masks = [None] * len(chunks)
+            self._chunk_view = view
+
+        for c, (start, end) in enumerate(zip(chunks.first.tolist(), chunks.end.tolist())):
+            chunk_mask = box_mask[start:end]
+            old = self._chunk_masks[c]
+            if old is not None and np.array_equal(old, chunk_mask):
+                continue
+            self._chunk_masks[c] = chunk_mask.copy()
+            self._chunk_batches[c] = self._tris_batch(self.shader, *self.gcode.chunk_tris(start, end, chunk_mask, view)) if chunk_mask.any() else None
+
+    def _reset_chunks(self) -> None:
+        self._chunk_batches = []
+        self._chunk_masks = []
+        self._chunk_view = None
+        self._visible_key = None
+        self._visible = None
+
     @staticmethod
     def _add_text(text: str = "placeholder", x: int = 0, y: int = 0, rgba=(1, 1, 1, 1), size: float = 25.0) -> None:
         blf.position(0, x, y, 0)
@@ -468,14 +696,12 @@ class GcodeDraw:
         blf.draw(0, text)
 
     def _legend_draw(self, _0, _1) -> None:
-        if not self.gcode:
+        if not (self.gcode and self._last_view):
             return
 
-        settings = workspace_settings()
-        view = str(settings.get("gcode_preview_view", "feature_type"))
-
-        legend = self.gcode.legend_for_view(view)
-        title_id = view
+        # view and legend as of the last update, the settings are not re-read every frame
+        legend = self._legend
+        title_id = self._last_view
 
         i = 0
         for i, (k, v) in enumerate(legend.items()):
@@ -490,6 +716,12 @@ class GcodeDraw:
         i += 1
         self._add_text(legend_title_mapping.get(title_id, title_id), 15, 15 + i * 40)
 
+    def _ensure_handlers(self) -> None:
+        if not self._draw_handler:
+            self._draw_handler = bpy.types.SpaceView3D.draw_handler_add(self._gpu_draw, (None, None), "WINDOW", "POST_VIEW")
+        if not self._legend_draw_handler:
+            self._legend_draw_handler = bpy.types.SpaceView3D.draw_handler_add(self._legend_draw, (None, None), "WINDOW", "POST_PIXEL")
+
     def _gpu_undraw(self) -> None:
         if self._draw_handler:
             bpy.types.SpaceView3D.draw_handler_remove(self._draw_handler, "WINDOW")
@@ -515,29 +747,166 @@ class GcodeDraw:
                 print(f"Could not hide object {obj!r}: {e}")
 
     def draw(self, metadata: dict, objects: list["Object"] = []) -> None:
+        # objects are hidden once per preview, not on every update
+        self._cancel_job()
+        if self.enabled:
+            self._show_objects()
         self.enabled = True
         self.hidden_objects = objects
+        self._hide_objects()
         self._preview_data = metadata
 
-        self.gcode = SegmentTrisCache(
-            self._preview_data["gcode_path"],
-            self._preview_data["transform"],
-            0.001 / float(self._preview_data["scene_scale"]),
-        )
-
-        # reset caches to force initial build
+        # the previous preview stays hidden until the new one is ready
+        self.gcode = None
+        self.instanced = None
+        self.batch = []
         self._last_key = None
         self._last_view = None
-        self._last_seg_mask = None
+        self._legend = {}
+        self.source = []
+        self._reset_chunks()
+
+        transform = np.asarray(self._preview_data["transform"], dtype=np.float32)
+        scale = 0.001 / float(self._preview_data["scene_scale"])
+        cancel = threading.Event()
+        self._cancel = cancel
+        self.warning = ""
+        self._set_progress(0.0, "Parsing G-code...")
+        if not self._executor:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self._job_progress = SimpleQueue()
+        self._job = self._executor.submit(self._prepare, self._preview_data["gcode_path"], transform, scale, cancel, self._job_progress)
+        bpy.app.timers.register(lambda: self._poll(cancel), first_interval=PREPARE_POLL_INTERVAL)
+
+    def _prepare(self, path: str, transform: NDArray[np.float32], scale: float, cancel: threading.Event, progress: SimpleQueue) -> tuple[SegmentTrisCache, NDArray[np.float32], int] | None:
+        # worker thread: numpy only, nothing here may touch bpy, gpu or the drawer's state
+        gcode = SegmentTrisCache(path, transform, scale)
+        if cancel.is_set():
+            return None
+        progress.put((0.7, "Building preview..."))
+        records = gcode.point_records()
+        return gcode, records, gcode.low_layers_end(FIRST_PASS_SEGMENTS)
+
+    def _poll(self, cancel: threading.Event) -> float | None:
+        # timer: uploads the lowest layers first, then the whole print
+        if cancel.is_set() or cancel is not self._cancel or not self._job:
+            return None
+
+        if self._records is None:
+            self._drain_progress()
+            if not self._job.done():
+                redraw()
+                return PREPARE_POLL_INTERVAL
+            try:
+                result = self._job.result()
+            except Exception as e:
+                self.warning = f"G-code preview failed: {e}"
+                self._finish_job()
+                return None
+            if result is None:
+                return None
+
+            gcode, records, first = result
+            self.gcode = gcode
+            self.warning = gcode.cache_error or ""
+            self.update_source(float(workspace_settings().get("gcode_preview_inspect", 0.0)))
+            self._records = records
+            if first < gcode.S:
+                self.instanced = self._create_instanced(records[:first])
+                if self.instanced:
+                    self._refresh()
+                    shown = int(np.count_nonzero(gcode.layers.last < first))
+                    self._set_progress(0.85, f"Showing {shown} of {len(gcode.layers)} layers, loading the rest...")
+                    return PREPARE_POLL_INTERVAL
+
+        records = self._records
+        self._records = None
+        self.instanced = self._create_instanced(records)
+        self._refresh()
+        self._finish_job()
+        return None
+
+    def update_source(self, inspect: float) -> None:
+        # inspect: slider position over all moves
+        if not (self.gcode and self.gcode.S):
+            self.source = []
+            return
+        seg = round(inspect * (self.gcode.S - 1))
+        try:
+            self.source = self.gcode.source_lines(seg, 2, 2)
+        except OSError as e:
+            self.source = []
+            self.warning = f"Could not read G-code source: {e}"
+
+    def _create_instanced(self, records: NDArray[np.float32]) -> InstancedSegments | None:
+        pd = self._preview_data
+        assert pd
+        transform = np.asarray(pd["transform"], dtype=np.float32)
+        scale = 0.001 / float(pd["scene_scale"])
+        return create_instanced(records, colormap_rows, len(range_colors), transform, scale)
 
+    def _refresh(self) -> None:
+        self._last_key = None
         self.update()
 
+    def _set_progress(self, progress: float, text: str) -> None:
+        self.progress, self.progress_text = progress, text
+        redraw()
+
+    def _drain_progress(self) -> None:
+        queue = self._job_progress
+        while queue:
+            try:
+                self._set_progress(*queue.get_nowait())
+            except Empty:
+                break
+
+    def _finish_job(self) -> None:
+        self._job = None
+        self._job_progress = None
+        self._records = None
+        self._set_progress(0.0, "")
+
+    def _cancel_job(self) -> None:
+        # a running parse is not interrupted, its result is dropped when it returns
+        if self._cancel:
+            self._cancel.set()
+            self._cancel = None
+        self._finish_job()
+
     def _settings_key(self, settings: dict[str, Any]) -> tuple:
         view = str(settings.get("gcode_preview_view", "feature_type"))
         zmin = float(settings.get("gcode_preview_min_z", -1e9))
         zmax = float(settings.get("gcode_preview_max_z", 1e9))
         toggles = tuple(bool(settings.get(p, False)) for p in prop_to_id.keys())
-        return (view, zmin, zmax, toggles)
+        lod = str(settings.get("gcode_preview_lod", "full"))
+        budget = int(settings.get("gcode_preview_tri_budget", 0))
+        return (view, zmin, zmax, toggles, lod, budget)
+
+    def _update_instanced(self, settings: dict[str, Any], view: str, zmin: float, zmax: float, lod: str, budget: int) -> None:
+        # no per-segment work: z changes only move the instance range and the uniforms
+        inst = self.instanced
+        assert inst and self.gcode
+
+        inst.view = VIEW_IDS.get(view, -1)
+        inst.value_range = self.gcode.view_range(view) if view in NUMERIC_VIEWS else (0.0, 1.0)
+        inst.feature_mask = self.gcode.feature_bits_from_settings(settings)
+        inst.z_range = (zmin, zmax)
+        # during the first pass only the lowest layers are uploaded
+        start, end = self.gcode.draw_range(zmin, zmax)
+        inst.start, inst.end = min(start, inst.count), min(end, inst.count)
+
+        inst.draw_boxes = lod != "overview"
+        inst.draw_lines = lod == "budget"
+        split = self.gcode.lod_split_z_range(inst.feature_mask, zmin, zmax, budget) if lod == "budget" else -np.inf
+        inst.split_z = float(np.clip(split, -FAR, FAR))
+
+    def _seg_mask(self, settings: dict[str, Any]) -> NDArray[np.bool]:
+        assert self.gcode
+        extrusion = self.gcode._extrusion_mask
+        display = self.gcode.display_mask_from_settings(settings)
+        height = self.gcode.height_mask_from_settings(settings)
+        return extrusion & display & height
 
     from ..utils.profiling import profiler
 
@@ -553,54 +922,67 @@ class GcodeDraw:
         if self._last_key == key:
             return
 
-        view, zmin, zmax, _toggles = key
+        view, zmin, zmax, _toggles, lod, budget = key
 
         # Ensure plate batch is up-to-date (cheap key check)
         self._ensure_plate_batch()
 
-        # Build seg mask cheaply
-        extrusion = self.gcode._extrusion_mask
-        display = self.gcode.display_mask_from_settings(settings)
-        height = self.gcode.height_mask_from_settings(settings)
-
-        # NOTE: your height mask is point-based; original code ANDs it with seg masks.
-        # This assumes mesh_data.pos is segment-aligned in length. Preserving original behavior.
-        seg_mask = extrusion & display & height
-
-        # Colors: already precomputed per view
-        colors = self.gcode.colors_for_view(view)
-
-        tris_idx = self.gcode.tris_idx_for_seg_mask(seg_mask)
-
-        # rebuild only the gcode batch; plate batch reused
-        gcode_batch = self._tris_batch(self.shader, self.gcode.points_pos, colors, tris_idx)
-
-        self.batch = [gcode_batch, self._plate_batch]
-
-        # handlers: only re-add if not present (but you currently remove/add each update)
-        # Keeping your behavior but only when key changes.
-        self._gpu_undraw()
-        self._draw_handler = bpy.types.SpaceView3D.draw_handler_add(self._gpu_draw, (None, None), "WINDOW", "POST_VIEW")
-        self._legend_draw_handler = bpy.types.SpaceView3D.draw_handler_add(self._legend_draw, (None, None), "WINDOW", "POST_PIXEL")
-
-        self._hide_objects()
+        lines_batch = None
+        if self.instanced:
+            # the shader filters and colors segments itself, only its uniforms change
+            self._update_instanced(settings, view, zmin, zmax, lod, budget)
+            if lod == "overview":
+                line_pos, line_color = self.gcode.lines_for_seg_mask(self._seg_mask(settings), view, merge=True)
+                lines_batch = self._lines_batch(self.shader, line_pos, line_color)
+        else:
+            seg_mask = self._seg_mask(settings)
+
+            # Level of detail: boxes near the top of the range, lines below or everywhere
+            box_mask, line_mask = seg_mask, None
+            if lod == "budget":
+                box_mask, line_mask = self.gcode.lod_split(seg_mask, budget)
+            elif lod == "overview":
+                box_mask, line_mask = np.zeros_like(seg_mask), seg_mask
+
+            # rebuild only the chunks that changed; plate batch reused
+            self._update_chunk_batches(box_mask, view)
+            if line_mask is not None:
+                line_pos, line_color = self.gcode.lines_for_seg_mask(line_mask, view, merge=(lod == "overview"))
+                lines_batch = self._lines_batch(self.shader, line_pos, line_color)
+
+        # handlers stay registered for the whole preview, they just pick up the new batches
+        self.batch = [lines_batch, self._plate_batch]
+        self._ensure_handlers()
         self._tag_redraw()
 
         self._last_key = key
+        self._last_view = view
+        self._legend = self.gcode.legend_for_view(view)
+
+    def shutdown(self) -> None:
+        # unregister: stop the preview and let a running parse finish without its result
+        self.stop()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
 
     def stop(self) -> None:
+        self._cancel_job()
         self.enabled = False
         self._gpu_undraw()
         self._show_objects()
         self.hidden_objects = []
 
         self.gcode = None
+        self.instanced = None
         self._preview_data = None
         self.batch = []
 
         self._last_key = None
         self._last_view = None
-        self._last_seg_mask = None
+        self._legend = {}
+        self.source = []
+        self._reset_chunks()
 
         self._plate_batch = None
         self._plate_key = None
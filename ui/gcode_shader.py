@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import bpy
+import gpu
+import numpy as np
+from gpu_extras.batch import batch_for_shader
+
+if TYPE_CHECKING:
+    from gpu.types import GPUShader, GPUBatch, GPUTexture
+    from numpy.typing import NDArray
+
+
+# -----------------------------------------------------------------------------
+# Instanced segment shader
+# -----------------------------------------------------------------------------
+
+# Every segment is one instance: the vertex shader fetches the records of its two
+# points from a float texture and places the corners of a box (or the ends of a
+# line) around them, so the GPU only holds 32 bytes per segment.
+
+ROW_WIDTH = 4096    # texels per records texture row
+MAX_ROWS = 16384    # common GPU texture size limit
+
+VIEW_IDS: dict[str, int] = {
+    "feature_type": 0,
+    "height": 1,
+    "width": 2,
+    "fan_speed": 3,
+    "temperature": 4,
+}
+
+# corner: (end, z offset, side offset, brightness), matches SegmentTrisCache.__tris_points
+BOX_CORNERS = np.array(
+    [
+        [0, 1, 0, 1.00], [0, 0, -1, 0.75], [0, -1, 0, 0.50], [0, 0, 1, 0.75],
+        [1, 1, 0, 1.00], [1, 0, -1, 0.75], [1, -1, 0, 0.50], [1, 0, 1, 0.75],
+    ],
+    dtype=np.float32,
+)
+BOX_TRIS = np.array(
+    [[0, 4, 1], [1, 4, 5], [1, 5, 2], [3, 7, 0], [2, 5, 6], [2, 6, 3], [3, 6, 7], [7, 4, 0]],
+    dtype=np.int32,
+)
+LINE_CORNERS = np.array([[0, 0, 0, 1.0], [1, 0, 0, 1.0]], dtype=np.float32)
+
+FAR = 1e30 # stands in for infinity in z windows
+
+_VERTEX_SOURCE = """
+vec4 record(int point, int k)
+{
+    int t = 2 * point + k;
+    return texelFetch(records, ivec2(t % rowWidth, t / rowWidth), 0);
+}
+
+void main()
+{
+    int i = base + gl_InstanceID;
+    int prev = max(i - 1, 0);
+    vec4 a = record(i, 0);      /* x, y, z, feature (negative: travel) */
+    vec4 b = record(i, 1);      /* width, height, fan, temperature */
+    vec4 a0 = record(prev, 0);
+    vec4 b0 = record(prev, 1);
+
+    int feature = int((a.w < 0.0 ? -1.0 - a.w : a.w) + 0.5);
+    bool visible = a.w >= 0.0 && (featureMask & (1 << feature)) != 0
+        && a.z > zWindow.x && a.z < zWindow.y && a.z >= zWindow.z && a.z < zWindow.w;
+    if (!visible) {
+        gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+        color = vec4(0.0);
+        return;
+    }
+
+    vec3 d = a.xyz - a0.xyz;
+    float len = length(d);
+    vec3 u = len > 1e-12 ? d / len : vec3(0.0);
+    vec3 side = vec3(-u.y, u.x, 0.0);
+    vec3 p = mix(a0.xyz, a.xyz, corner.x)
+        + vec3(0.0, 0.0, b0.y * 0.5 * corner.y)
+        + side * (b0.x * 0.5 * corner.z);
+    gl_Position = ModelViewProjectionMatrix * vec4((p + xform.xyz) * xform.w, 1.0);
+
+    vec4 c = vec4(1.0);
+    if (view == 0) {
+        c = texelFetch(colormap, ivec2(feature, 0), 0);
+    }
+    else if (view > 0) {
+        float v = view == 1 ? b.y : view == 2 ? b.x : view == 3 ? b.z : b.w;
+        float t = clamp((v - valueRange.x) / max(valueRange.y - valueRange.x, 1e-12), 0.0, 1.0);
+        float x = t * float(rangeColors - 1);
+        int k = min(int(floor(x)), rangeColors - 2);
+        c = mix(texelFetch(colormap, ivec2(k, 1), 0), texelFetch(colormap, ivec2(k + 1, 1), 0), x - float(k));
+    }
+    color = vec4(c.rgb * corner.w, 1.0);
+}
+"""
+
+_FRAGMENT_SOURCE = """
+void main()
+{
+    FragColor = color;
+}
+"""
+
+_shader: GPUShader | None = None
+
+def segment_shader() -> GPUShader:
+    global _shader
+    if _shader is None:
+        iface = gpu.types.GPUStageInterfaceInfo("us_gcode_segment_iface")
+        iface.smooth("VEC4", "color")
+
+        info = gpu.types.GPUShaderCreateInfo()
+        info.push_constant("MAT4", "ModelViewProjectionMatrix")
+        info.push_constant("VEC4", "xform")        # transform xyz, scale
+        info.push_constant("VEC4", "zWindow")      # z range (exclusive), LOD split [lo, hi)
+        info.push_constant("VEC2", "valueRange")
+        info.push_constant("INT", "featureMask")
+        info.push_constant("INT", "view")
+        info.push_constant("INT", "rowWidth")
+        info.push_constant("INT", "rangeColors")
+        info.push_constant("INT", "base")
+        info.sampler(0, "FLOAT_2D", "records")
+        info.sampler(1, "FLOAT_2D", "colormap")
+        info.vertex_in(0, "VEC4", "corner")
+        info.vertex_out(iface)
+        info.fragment_out(0, "VEC4", "FragColor")
+        info.vertex_source(_VERTEX_SOURCE)
+        info.fragment_source(_FRAGMENT_SOURCE)
+
+        _shader = gpu.shader.create_from_info(info)
+    return _shader
+
+def _texture(data: NDArray[np.float32]) -> GPUTexture:
+    # (rows, width, 4) float32 -> RGBA32F texture
+    rows, width, _ = data.shape
+    buf = gpu.types.Buffer("FLOAT", data.size, data.ravel())
+    return gpu.types.GPUTexture((width, rows), format="RGBA32F", data=buf)
+
+class InstancedSegments:
+    records: GPUTexture
+    colormap: GPUTexture
+    count: int
+
+    def __init__(self, records: NDArray[np.float32], colormap: NDArray[np.float32], range_colors: int, transform: NDArray[np.float32], scale: float) -> None:
+        # records: (S, 2, 4) per point, see SegmentTrisCache.point_records
+        self.shader = segment_shader()
+        self.count = len(records)
+        texels = records.reshape(-1, 4)
+        rows = max(-(-len(texels) // ROW_WIDTH), 1)
+        padded = np.zeros((rows * ROW_WIDTH, 4), dtype=np.float32)
+        padded[:len(texels)] = texels
+        self.records = _texture(padded.reshape(rows, ROW_WIDTH, 4))
+        self.colormap = _texture(colormap)
+        self.range_colors = range_colors
+
+        self.box_batch: GPUBatch = batch_for_shader(self.shader, "TRIS", {"corner": BOX_CORNERS}, indices=BOX_TRIS) #type: ignore
+        self.line_batch: GPUBatch = batch_for_shader(self.shader, "LINES", {"corner": LINE_CORNERS}) #type: ignore
+
+        self.xform = (*(float(v) for v in transform), float(scale))
+        self.view = 0
+        self.value_range = (0.0, 1.0)
+        self.feature_mask = 0
+        self.z_range = (-FAR, FAR)
+        self.split_z = -FAR     # boxes at or above, lines below
+        self.start, self.end = 0, self.count    # instance range to draw
+        self.draw_lines = False
+        self.draw_boxes = True
+
+    @staticmethod
+    def fits(n_points: int) -> bool:
+        return 2 * n_points <= ROW_WIDTH * MAX_ROWS
+
+    def _draw(self, batch: GPUBatch, z_lo: float, z_hi: float, runs: list[tuple[int, int]]) -> None:
+        shader = self.shader
+        shader.bind()
+        shader.uniform_float("ModelViewProjectionMatrix", gpu.matrix.get_projection_matrix() @ gpu.matrix.get_model_view_matrix())
+        shader.uniform_float("xform", self.xform)
+        shader.uniform_float("zWindow", (*self.z_range, z_lo, z_hi))
+        shader.uniform_float("valueRange", self.value_range)
+        shader.uniform_int("featureMask", self.feature_mask)
+        shader.uniform_int("view", self.view)
+        shader.uniform_int("rowWidth", ROW_WIDTH)
+        shader.uniform_int("rangeColors", self.range_colors)
+        shader.uniform_sampler("records", self.records)
+        shader.uniform_sampler("colormap", self.colormap)
+        for start, end in runs:
+            shader.uniform_int("base", start)
+            batch.draw_instanced(shader, instance_start=0, instance_count=end - start)
+
+    def draw(self, runs: list[tuple[int, int]] | None = None) -> None:
+        # runs: instance ranges to draw, within [start, end); the whole range when None
+        if runs is None:
+            runs = [(self.start, self.end)] if self.end > self.start else []
+        if not runs:
+            return
+        if self.draw_boxes:
+            self._draw(self.box_batch, self.split_z, FAR, runs)
+        if self.draw_lines:
+            self._draw(self.line_batch, -FAR, self.split_z, runs)
+
+def create_instanced(records: NDArray[np.float32], colormap: NDArray[np.float32], range_colors: int, transform: NDArray[np.float32], scale: float) -> InstancedSegments | None:
+    # None when running headless, past the texture limits or on GPU backends that reject the shader
+    if bpy.app.background or not InstancedSegments.fits(len(records)):
+        return None
+    try:
+        return InstancedSegments(records, colormap, range_colors, transform, scale)
+    except Exception as e:
+        print(f"Instanced G-code preview unavailable, using expanded geometry: {e}")
+        return None
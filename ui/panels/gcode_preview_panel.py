@@ -59,12 +59,28 @@ class SlicerPanel_2_Gcode_Preview(BasePanel):
                     row.label(text="Preview is only supported with non-binary gcode!")
                     row = layout.row()
 
+        if drawer.progress_text:
+            layout.progress(factor=drawer.progress, text=drawer.progress_text)
+        if drawer.warning:
+            layout.label(text=drawer.warning, icon='ERROR')
+
         row = layout.row()
 
         row.prop(ws_pg, 'gcode_preview_view')
         
         row.prop(ws_pg, 'gcode_preview_min_z', slider=True)
         row.prop(ws_pg, 'gcode_preview_max_z', slider=True)
+        row.prop(ws_pg, 'gcode_preview_snap_layers', text="", icon='SNAP_ON' if ws_pg.gcode_preview_snap_layers else 'SNAP_OFF')
+
+        if drawer.gcode and len(drawer.gcode.layers):
+            layers = drawer.gcode.layers
+            lo, hi = layers.layer_range(ws_pg.gcode_preview_min_z, ws_pg.gcode_preview_max_z)
+            layout.label(text=f"Layers {lo + 1}-{hi} of {len(layers)}" if hi > lo else f"No layers in range ({len(layers)} total)")
+
+        row = layout.row()
+        row.prop(ws_pg, 'gcode_preview_lod')
+        if ws_pg.gcode_preview_lod == 'budget':
+            row.prop(ws_pg, 'gcode_preview_tri_budget')
 
         layout.prop(ws_pg, 'gcode_perimeter')
         layout.prop(ws_pg, 'gcode_external_perimeter')
@@ -77,4 +93,10 @@ class SlicerPanel_2_Gcode_Preview(BasePanel):
         layout.prop(ws_pg, 'gcode_custom')
         layout.prop(ws_pg, 'gcode_support_material')
         layout.prop(ws_pg, 'gcode_support_material_interface')
-        layout.prop(ws_pg, 'gcode_gap_fill')
\ No newline at end of file
+        layout.prop(ws_pg, 'gcode_gap_fill')
+
+        if drawer.gcode and drawer.gcode.S:
+            layout.prop(ws_pg, 'gcode_preview_inspect', slider=True)
+            box = layout.box()
+            for line, text in drawer.source:
+                box.label(text=f"{line + 1}: {text}")
\ No newline at end of file
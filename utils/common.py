@@ -17,10 +17,11 @@ def get_bed_size(bed_shape: str) -> tuple:
         return 0, 0
 
 def get_print_stats(gcode: Path) -> tuple[str, str]:
-    from ..infra.gcode import parse_gcode_value
+    from ..infra.gcode import read_gcode_metadata
     if os.path.exists(gcode):
-        print_time: str = parse_gcode_value(gcode, 'estimated printing time \\(normal mode\\)') or ''
-        print_weight: str = parse_gcode_value(gcode, 'filament used \\[g\\]') or ''
+        metadata: dict[str, str] = read_gcode_metadata(gcode)
+        print_time: str = metadata.get('estimated printing time (normal mode)', '')
+        print_weight: str = metadata.get('filament used [g]', '')
         return (print_time, print_weight)
     return ('', '')
 